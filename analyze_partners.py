@@ -1,4 +1,5 @@
 import pandas as pd
+from spatial_index import COLOCATION_KM, colocated_groups
 
 # Read the CSV
 df = pd.read_csv('partners_data_with_coords.csv')
@@ -23,4 +24,10 @@ for project in project_counts.keys():
     print(f"\n{project} partners:")
     partners = df[(df[project] == 1) & (df['Funder'] == 0)]['Institution'].tolist()
     for partner in partners:
-        print(f"- {partner}") 
\ No newline at end of file
+        print(f"- {partner}")
+
+# Partners sharing a site, which overlap completely on the maps
+sites = colocated_groups(df)
+print(f"\nShared sites (partners within {COLOCATION_KM:g} km of each other): {len(sites)}")
+for _, site in sites.iterrows():
+    print(f"- {site['partners']} partners: {site['institutions']}")
@@ -0,0 +1,174 @@
+"""Pipeline benchmarks in asv style, on partner tables of 100 to 100k rows.
+
+Run offline with ``python -m benchmarks.run`` (or ``asv run --environment
+existing`` where asv is installed). Every case runs in a scratch directory
+holding the scaled table under each file name the scripts read.
+"""
+import contextlib
+import io
+import os
+import runpy
+import shutil
+import sys
+import tempfile
+
+import matplotlib
+matplotlib.use('Agg')
+
+from benchmarks.datasets import REPO, SIZES, scaled_partner_table, write_inputs
+
+if REPO not in sys.path:
+    sys.path.insert(0, REPO)
+
+from render_manifest import RENDERERS  # noqa: E402
+
+# Natural Earth layers the cartopy renderers draw, as (category, name) at 110m
+NATURAL_EARTH_LAYERS = [('physical', 'land'), ('physical', 'ocean'), ('physical', 'coastline'),
+                        ('cultural', 'admin_0_boundary_lines_land')]
+
+INTERACTIVE = [name for name, spec in RENDERERS.items()
+               if all(out.endswith('.html') for out in spec['outputs'])]
+# map.py is covered stage by stage in NetworkGraph and NetworkLayout
+STATIC = [name for name in RENDERERS if name not in INTERACTIVE and name != 'map']
+
+
+def natural_earth_available():
+    """Whether the 110m Natural Earth shapefiles are on disk, so nothing is downloaded."""
+    import cartopy
+    dirs = [cartopy.config.get('pre_existing_data_dir'), cartopy.config.get('data_dir')]
+    for category, name in NATURAL_EARTH_LAYERS:
+        rel = os.path.join('shapefiles', 'natural_earth', category, f'ne_110m_{name}.shp')
+        if not any(d and os.path.exists(os.path.join(d, rel)) for d in dirs):
+            return False
+    return True
+
+
+def uses_cartopy(name):
+    for path in RENDERERS[name]['style']:
+        with open(os.path.join(REPO, path), encoding='utf-8') as f:
+            if 'cartopy' in f.read():
+                return True
+    return False
+
+
+def run_script(name):
+    """Run a top-level pipeline script as ``__main__`` in the current directory."""
+    import matplotlib.pyplot as plt
+    argv = sys.argv
+    sys.argv = [f'{name}.py']
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            runpy.run_path(os.path.join(REPO, f'{name}.py'), run_name='__main__')
+    finally:
+        sys.argv = argv
+        plt.close('all')
+
+
+class _ScratchDir:
+    params = [SIZES]
+    param_names = ['rows']
+    timeout = 600
+    # Larger tables are skipped; None runs every size
+    max_rows = None
+
+    def setup(self, rows, *args):
+        # NotImplementedError marks the case as skipped rather than failed
+        if self.max_rows is not None and rows > self.max_rows:
+            raise NotImplementedError(f"more than {self.max_rows} rows is infeasible for this case")
+        self.df = scaled_partner_table(rows)
+        self._cwd = os.getcwd()
+        self._dir = tempfile.mkdtemp(prefix='partners-bench-')
+        write_inputs(self.df, self._dir)
+        os.chdir(self._dir)
+
+    def teardown(self, *args):
+        os.chdir(self._cwd)
+        shutil.rmtree(self._dir, ignore_errors=True)
+
+
+class CleanPartners(_ScratchDir):
+    def time_clean(self, rows):
+        from clean_partners_data import clean_partners_data
+        clean_partners_data('partner_updated.csv', 'partners_cleaned.csv')
+
+    def peakmem_clean(self, rows):
+        self.time_clean(rows)
+
+
+class AnalyzePartners(_ScratchDir):
+    def time_aggregations(self, rows):
+        run_script('analyze_partners')
+
+    def peakmem_aggregations(self, rows):
+        self.time_aggregations(rows)
+
+
+class NetworkGraph(_ScratchDir):
+    # 10k rows is already ~15M edges and 3.5 GB; 100k never finishes
+    max_rows = 10000
+
+    def setup(self, rows):
+        super().setup(rows)
+        import map as network_map
+        self.network_map = network_map
+
+    def time_build(self, rows):
+        self.network_map.build_partner_graph(self.df)
+
+    def peakmem_build(self, rows):
+        self.time_build(rows)
+
+
+class NetworkLayout(_ScratchDir):
+    # Beyond this the graph is tens of millions of edges before layout even starts
+    max_rows = 1000
+
+    def setup(self, rows):
+        super().setup(rows)
+        import map as network_map
+        self.network_map = network_map
+        self.graph = network_map.build_partner_graph(self.df)
+
+    def time_layout(self, rows):
+        self.network_map.partner_layout(self.graph)
+
+    def peakmem_layout(self, rows):
+        self.time_layout(rows)
+
+
+class StaticRenderers(_ScratchDir):
+    params = [STATIC, SIZES]
+    param_names = ['renderer', 'rows']
+
+    def setup(self, renderer, rows):
+        if uses_cartopy(renderer) and not natural_earth_available():
+            raise NotImplementedError("Natural Earth data not available offline")
+        super().setup(rows)
+
+    def time_render(self, renderer, rows):
+        run_script(renderer)
+
+    def peakmem_render(self, renderer, rows):
+        run_script(renderer)
+
+
+class InteractiveRenderers(_ScratchDir):
+    params = [INTERACTIVE, SIZES]
+    param_names = ['renderer', 'rows']
+    # Arcs are capped per project, so every size fits (100k: ~8 s, ~330 MB);
+    # lower this if a renderer goes quadratic again
+    max_rows = None
+
+    def setup(self, renderer, rows):
+        super().setup(rows)
+
+    def time_render(self, renderer, rows):
+        run_script(renderer)
+
+    def peakmem_render(self, renderer, rows):
+        run_script(renderer)
+
+    def track_output_bytes(self, renderer, rows):
+        run_script(renderer)
+        return sum(os.path.getsize(out) for out in RENDERERS[renderer]['outputs'])
+    track_output_bytes.unit = 'bytes'
@@ -0,0 +1,31 @@
+import os
+import sys
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO not in sys.path:
+    sys.path.insert(0, REPO)
+
+from synthetic_partners import generate_partners  # noqa: E402
+
+TEMPLATE_TABLE = os.path.join(REPO, 'partners_cleaned_with_short_names.csv')
+
+SIZES = [100, 1000, 10000, 100000]
+
+# Columns some scripts expect beyond the cleaned table
+EXTRA_COLUMNS = {'HIGH': 0}
+
+
+def scaled_partner_table(n, seed=0):
+    """``n`` synthetic partner rows shaped like the real table (same seed, same table)."""
+    df = generate_partners(n, seed=seed, like=TEMPLATE_TABLE)
+    for col, value in EXTRA_COLUMNS.items():
+        df[col] = value
+    return df
+
+
+def write_inputs(df, workdir):
+    """Write ``df`` under every file name the pipeline scripts read."""
+    df.to_csv(os.path.join(workdir, 'partners_data_with_coords.csv'), index=False)
+    df.to_csv(os.path.join(workdir, 'partners_cleaned_with_short_names.csv'), index=False)
+    df.to_csv(os.path.join(workdir, 'partners_data.csv'), index=False)
+    df.to_csv(os.path.join(workdir, 'partner_updated.csv'), index=False, sep='\t')
@@ -0,0 +1,163 @@
+"""Offline runner for the asv-style benchmarks, with per-commit result files.
+
+    python -m benchmarks.run                      # everything, saved under benchmarks/results/
+    python -m benchmarks.run -b Clean -r 100 1000  # a subset
+    python -m benchmarks.run --compare abc1234     # ratios against an earlier commit's results
+
+Each case runs in its own subprocess with the class ``timeout``. ``time_``
+results are the best of up to ``--repeat`` runs, ``peakmem_`` results are
+the tracemalloc peak in bytes, and ``track_`` results are the returned value.
+"""
+import argparse
+import importlib
+import inspect
+import itertools
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from benchmarks.datasets import REPO
+
+RESULTS_DIR = os.path.join(REPO, 'benchmarks', 'results')
+MODULES = ['benchmarks.bench_pipeline']
+PREFIXES = ('time_', 'peakmem_', 'track_')
+
+
+def discover(modules=MODULES):
+    """Yield (case name, class, method name, params) for every benchmark case."""
+    for module_name in modules:
+        module = importlib.import_module(module_name)
+        for cls_name, cls in inspect.getmembers(module, inspect.isclass):
+            if cls.__module__ != module_name or cls_name.startswith('_'):
+                continue
+            for method in sorted(m for m in dir(cls) if m.startswith(PREFIXES)):
+                for params in itertools.product(*cls.params):
+                    name = f"{module_name.rsplit('.', 1)[1]}.{cls_name}.{method}({', '.join(map(str, params))})"
+                    yield name, cls, method, params
+
+
+def run_case(module_name, cls_name, method, params, repeat):
+    """Run one case in this process and return its result dict."""
+    cls = getattr(importlib.import_module(module_name), cls_name)
+    bench = cls()
+    try:
+        bench.setup(*params)
+    except NotImplementedError as e:
+        return {'status': 'skipped', 'reason': str(e)}
+    try:
+        fn = getattr(bench, method)
+        if method.startswith('time_'):
+            times = []
+            deadline = time.perf_counter() + 5.0
+            while len(times) < repeat and (not times or time.perf_counter() < deadline):
+                start = time.perf_counter()
+                fn(*params)
+                times.append(time.perf_counter() - start)
+            return {'status': 'ok', 'value': min(times), 'unit': 'seconds', 'runs': len(times)}
+        if method.startswith('peakmem_'):
+            tracemalloc.start()
+            fn(*params)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            return {'status': 'ok', 'value': peak, 'unit': 'bytes'}
+        return {'status': 'ok', 'value': fn(*params), 'unit': getattr(fn, 'unit', '')}
+    except NotImplementedError as e:
+        return {'status': 'skipped', 'reason': str(e)}
+    finally:
+        if hasattr(bench, 'teardown'):
+            bench.teardown(*params)
+
+
+def current_commit():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO,
+                             capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def load_results(commit):
+    with open(os.path.join(RESULTS_DIR, f'{commit}.json'), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compare(old, new, threshold):
+    """Print cases whose value changed by more than ``threshold`` (a ratio)."""
+    for name, result in sorted(new['results'].items()):
+        before = old['results'].get(name, {})
+        if result.get('status') != 'ok' or before.get('status') != 'ok' or not before.get('value'):
+            continue
+        ratio = result['value'] / before['value']
+        if ratio > threshold or ratio < 1 / threshold:
+            flag = 'REGRESSION' if ratio > 1 else 'improved'
+            print(f"{flag:>10} {ratio:6.2f}x  {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the pipeline benchmarks offline")
+    parser.add_argument('-b', '--bench', help="regex selecting cases by name")
+    parser.add_argument('-r', '--rows', type=int, nargs='*', help="only these table sizes")
+    parser.add_argument('--repeat', type=int, default=3, help="timing runs per case (best is kept)")
+    parser.add_argument('--commit', default=None, help="label for the results file (default: git HEAD)")
+    parser.add_argument('--compare', metavar='COMMIT', help="compare against stored results for COMMIT")
+    parser.add_argument('--threshold', type=float, default=1.2, help="ratio reported by --compare")
+    parser.add_argument('--case', nargs=4, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        module_name, cls_name, method, params = args.case
+        print(json.dumps(run_case(module_name, cls_name, method, json.loads(params), args.repeat)))
+        return
+
+    commit = args.commit or current_commit()
+    env = dict(os.environ, MPLBACKEND='Agg', PYTHONPATH=os.pathsep.join(filter(None, [REPO, os.environ.get('PYTHONPATH')])))
+    results = {}
+    for name, cls, method, params in discover():
+        if args.bench and not re.search(args.bench, name):
+            continue
+        if args.rows and params[-1] not in args.rows:
+            continue
+        cmd = [sys.executable, '-m', 'benchmarks.run', '--repeat', str(args.repeat),
+               '--case', cls.__module__, cls.__name__, method, json.dumps(list(params))]
+        try:
+            proc = subprocess.run(cmd, cwd=REPO, env=env, capture_output=True, text=True,
+                                  timeout=getattr(cls, 'timeout', 600))
+            lines = proc.stdout.strip().splitlines()
+            if proc.returncode == 0 and lines:
+                result = json.loads(lines[-1])
+            else:
+                result = {'status': 'failed', 'reason': proc.stderr.strip().splitlines()[-1:]}
+        except subprocess.TimeoutExpired:
+            result = {'status': 'timeout', 'reason': f"over {getattr(cls, 'timeout', 600)}s"}
+        results[name] = result
+        shown = (f"{result['value']:.4g} {result['unit']}" if result['status'] == 'ok'
+                 else f"{result['status']}: {result.get('reason')}")
+        print(f"{name}: {shown}", flush=True)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    record = {'commit': commit, 'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+              'machine': {'platform': platform.platform(), 'python': platform.python_version(),
+                          'cpus': os.cpu_count()},
+              'results': results}
+    path = os.path.join(RESULTS_DIR, f'{commit}.json')
+    if os.path.exists(path):
+        # Partial runs add to what is already stored for the commit
+        previous = load_results(commit)
+        previous['results'].update(results)
+        record['results'] = previous['results']
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(record, f, indent=2, sort_keys=True)
+    print(f"Results saved to {path}")
+
+    if args.compare:
+        compare(load_results(args.compare), record, args.threshold)
+
+
+if __name__ == "__main__":
+    main()
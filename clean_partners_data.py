@@ -1,6 +1,8 @@
 import pandas as pd
 import unidecode
+from instrumentation import timed
 
+@timed('clean partners')
 def clean_partners_data(input_file='partner_updated.csv', output_file='partners_cleaned.csv'):
     # Read the tab-separated file
     df = pd.read_csv(input_file, sep='\t')
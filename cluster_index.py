@@ -0,0 +1,231 @@
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from jinja2 import Template
+from folium.map import Layer
+from scipy.spatial import cKDTree
+
+from geojson_layers import compact_json
+from partner_geometry import MERCATOR_MAX_LAT, PROJECTS, project_bitmask
+
+
+def lonlat_to_unit(lon, lat):
+    """Project lon/lat to Web Mercator scaled to the unit square (y down, like tiles)."""
+    lat = np.radians(np.clip(np.asarray(lat, dtype=float), -MERCATOR_MAX_LAT, MERCATOR_MAX_LAT))
+    x = np.asarray(lon, dtype=float) / 360.0 + 0.5
+    y = 0.5 - np.log(np.tan(np.pi / 4 + lat / 2)) / (2 * np.pi)
+    return np.clip(x, 0, 1), np.clip(y, 0, 1)
+
+
+def unit_to_lonlat(x, y):
+    lon = (np.asarray(x) - 0.5) * 360.0
+    lat = np.degrees(2 * np.arctan(np.exp((0.5 - np.asarray(y)) * 2 * np.pi)) - np.pi / 2)
+    return lon, lat
+
+
+def _merge_level(x, y, count, mask, r):
+    """One greedy radius-merge pass, in the style of supercluster.
+
+    Points with no neighbour inside ``r`` pass through untouched; the greedy
+    loop only visits points that can actually merge.
+    """
+    xy = np.column_stack([x, y])
+    tree = cKDTree(xy)
+    pairs = tree.query_pairs(r, output_type='ndarray')
+    crowded = np.zeros(len(x), dtype=bool)
+    crowded[pairs.ravel()] = True
+    lone = np.flatnonzero(~crowded)
+    candidates = np.flatnonzero(crowded)
+
+    neighbours = tree.query_ball_point(xy[candidates], r)
+    visited = np.zeros(len(x), dtype=bool)
+    out_x, out_y, out_count, out_mask = [], [], [], []
+    for i, nb in zip(candidates, neighbours):
+        if visited[i]:
+            continue
+        nb = np.asarray(nb, dtype=np.int64)
+        nb = nb[~visited[nb]]
+        visited[nb] = True
+        w = count[nb]
+        total = w.sum()
+        out_x.append((x[nb] * w).sum() / total)
+        out_y.append((y[nb] * w).sum() / total)
+        out_count.append(total)
+        out_mask.append(np.bitwise_or.reduce(mask[nb]))
+    return (np.concatenate([x[lone], out_x]), np.concatenate([y[lone], out_y]),
+            np.concatenate([count[lone], np.array(out_count, dtype=np.int64)]),
+            np.concatenate([mask[lone], np.array(out_mask, dtype=np.int64)]))
+
+
+def build_cluster_index(lon, lat, masks=None, min_zoom=0, max_zoom=16, radius=40, extent=512):
+    """Hierarchical point clusters for every zoom level from ``max_zoom`` down.
+
+    ``radius`` is in pixels of an ``extent``-pixel tile, as in supercluster.
+    Returns ``{zoom: (x, y, count, mask)}`` in unit Mercator coordinates;
+    level ``max_zoom + 1`` holds the unclustered points. Cluster masks are
+    the OR of their members' project bitmasks.
+    """
+    lon = np.asarray(lon, dtype=float)
+    lat = np.asarray(lat, dtype=float)
+    keep = np.isfinite(lon) & np.isfinite(lat)
+    x, y = lonlat_to_unit(lon[keep], lat[keep])
+    count = np.ones(len(x), dtype=np.int64)
+    mask = (np.zeros(len(lon), dtype=np.int64) if masks is None else np.asarray(masks, dtype=np.int64))[keep]
+
+    levels = {max_zoom + 1: (x, y, count, mask)}
+    for z in range(max_zoom, min_zoom - 1, -1):
+        x, y, count, mask = _merge_level(x, y, count, mask, radius / (extent * 2 ** z))
+        levels[z] = (x, y, count, mask)
+    return levels
+
+
+def cluster_chunks(levels, chunk_zoom=6, precision=5):
+    """Split every level into spatial chunks keyed ``'z/x/y'``.
+
+    Chunks use the tile grid at ``min(z, chunk_zoom)``, so the browser only
+    fetches the chunks covering the current view at the current level. Each
+    chunk is a flat ``[lon, lat, count, mask, ...]`` list.
+    """
+    chunks = {}
+    for z, (x, y, count, mask) in levels.items():
+        cz = min(z, chunk_zoom)
+        n = 2 ** cz
+        tx = np.minimum((x * n).astype(np.int64), n - 1)
+        ty = np.minimum((y * n).astype(np.int64), n - 1)
+        lon, lat = unit_to_lonlat(x, y)
+        order = np.lexsort((ty, tx))
+        keys = tx[order] * n + ty[order]
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        for start, end in zip(starts, np.r_[starts[1:], len(order)]):
+            idx = order[start:end]
+            flat = np.column_stack([np.round(lon[idx], precision), np.round(lat[idx], precision),
+                                    count[idx], mask[idx]]).ravel().tolist()
+            chunks[f"{z}/{tx[idx[0]]}/{ty[idx[0]]}"] = [int(v) if float(v).is_integer() else v for v in flat]
+    return chunks
+
+
+def write_cluster_chunks(chunks, out_dir):
+    for key, values in chunks.items():
+        path = os.path.join(out_dir, *key.split('/')) + '.json'
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(compact_json(values))
+
+
+class ClusterIndexLayer(Layer):
+    """Draw precomputed clusters, loading only the level and chunks in view.
+
+    Give ``url`` (the directory written by ``write_cluster_chunks``, relative
+    to the saved HTML and served over HTTP) for large datasets, or ``chunks``
+    to embed everything in the page for small ones. ``projects`` is the
+    project order the masks were built with (bit i = projects[i]); it
+    defaults to the order of ``project_colors``.
+    """
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }} = (function(map) {
+                var projects = {{ this.projects_json }};
+                var colors = {{ this.colors_json }};
+                var embedded = {{ this.chunks_json }};
+                var url = {{ this.url_json }};
+                var minZoom = {{ this.min_zoom }}, maxZoom = {{ this.max_zoom }}, chunkZoom = {{ this.chunk_zoom }};
+                var renderer = L.canvas({padding: 0.5});
+                var group = L.layerGroup();
+                var cache = {};
+                var seq = 0;
+
+                function load(key) {
+                    if (!(key in cache)) {
+                        cache[key] = embedded ? Promise.resolve(embedded[key] || []) :
+                            fetch(url + '/' + key + '.json')
+                                .then(function(r) { return r.ok ? r.json() : []; })
+                                .catch(function() { return []; });
+                    }
+                    return cache[key];
+                }
+                function tileX(lon, n) { return Math.floor((lon + 180) / 360 * n); }
+                function tileY(lat, n) {
+                    lat = Math.max(-85.0511, Math.min(85.0511, lat)) * Math.PI / 180;
+                    return Math.floor((1 - Math.log(Math.tan(lat) + 1 / Math.cos(lat)) / Math.PI) / 2 * n);
+                }
+                function colorFor(mask) {
+                    for (var i = 0; i < projects.length; i++) { if (mask & (1 << i)) return colors[i]; }
+                    return '#3388ff';
+                }
+                function refresh() {
+                    var z = Math.max(minZoom, Math.min(maxZoom + 1, Math.round(map.getZoom())));
+                    var cz = Math.min(z, chunkZoom), n = 1 << cz;
+                    var b = map.getBounds().pad(0.1);
+                    var x0 = Math.max(0, tileX(b.getWest(), n)), x1 = Math.min(n - 1, tileX(b.getEast(), n));
+                    var y0 = Math.max(0, tileY(b.getNorth(), n)), y1 = Math.min(n - 1, tileY(b.getSouth(), n));
+                    var keys = [];
+                    for (var x = x0; x <= x1; x++) { for (var y = y0; y <= y1; y++) keys.push(z + '/' + x + '/' + y); }
+                    var token = ++seq;
+                    Promise.all(keys.map(load)).then(function(parts) {
+                        if (token !== seq) return;
+                        group.clearLayers();
+                        parts.forEach(function(a) {
+                            for (var i = 0; i < a.length; i += 4) {
+                                if (!b.contains([a[i + 1], a[i]])) continue;
+                                var count = a[i + 2];
+                                var marker = L.circleMarker([a[i + 1], a[i]], {
+                                    renderer: renderer,
+                                    radius: count > 1 ? 6 + 3 * Math.log2(count) : 5,
+                                    color: 'white', weight: 1, fill: true, fillOpacity: 0.75,
+                                    fillColor: colorFor(a[i + 3])
+                                });
+                                if (count > 1) {
+                                    marker.bindTooltip(count + ' partners');
+                                    marker.on('click', function(e) { map.setView(e.latlng, map.getZoom() + 2); });
+                                }
+                                group.addLayer(marker);
+                            }
+                        });
+                    });
+                }
+                map.on('moveend', refresh);
+                group.addTo(map);
+                refresh();
+                return group;
+            })({{ this._parent.get_name() }});
+        {% endmacro %}
+    """)
+
+    def __init__(self, project_colors=None, url=None, chunks=None, projects=None, min_zoom=0, max_zoom=16,
+                 chunk_zoom=6, name='Partner clusters', overlay=True, control=True, show=True):
+        super().__init__(name=name, overlay=overlay, control=control, show=show)
+        self._name = 'ClusterIndexLayer'
+        if (url is None) == (chunks is None):
+            raise ValueError("Pass exactly one of url or chunks")
+        project_colors = project_colors or {}
+        # Colours are looked up by mask bit, so they follow the bitmask's project order
+        projects = list(project_colors) if projects is None else list(projects)
+        self.projects_json = compact_json(projects)
+        self.colors_json = compact_json([project_colors.get(p, '#3388ff') for p in projects])
+        self.chunks_json = compact_json(chunks) if chunks is not None else 'null'
+        self.url_json = compact_json(url) if url is not None else 'null'
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+        self.chunk_zoom = chunk_zoom
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute zoom-level partner clusters")
+    parser.add_argument('--csv', default='partners_data_with_coords.csv')
+    parser.add_argument('--out', default='clusters')
+    parser.add_argument('--max-zoom', type=int, default=16)
+    parser.add_argument('--radius', type=float, default=40)
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.csv)
+    projects = [proj for proj in PROJECTS if proj in df.columns]
+    levels = build_cluster_index(df['lon'], df['lat'], project_bitmask(df, projects),
+                                 max_zoom=args.max_zoom, radius=args.radius)
+    chunks = cluster_chunks(levels)
+    write_cluster_chunks(chunks, args.out)
+    print(json.dumps({z: int(len(levels[z][0])) for z in sorted(levels)}))
+    print(f"Wrote {len(chunks)} chunks to {args.out}")
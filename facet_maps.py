@@ -0,0 +1,154 @@
+import argparse
+import math
+
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+import cartopy.crs as ccrs
+import cartopy.feature as cfeature
+from matplotlib.collections import LineCollection
+
+from partner_geometry import (collaboration_pairs, great_circle_points, project_members,
+                              split_antimeridian)
+
+# Scientific color palette (colorblind-friendly), as in scientific_publication_map.py
+project_colors = {
+    'CHAMNHA': '#0077BB',
+    'HEAT': '#EE3377',
+    'ENBEL': '#009988',
+    'GHAP': '#CC3311',
+    'HAPI': '#33BBEE',
+    'BioHEAT': '#EE7733',
+    'HIGH_Horizons': '#555555'
+}
+
+_basemap_cache = {}
+
+
+def render_basemap(projection, extent, size_inches, dpi):
+    """Rasterize land/ocean/coastlines once for a panel geometry.
+
+    Returns the RGBA image and its extent in projection coordinates. Results
+    are memoised, so every panel with the same geometry reuses one render.
+    """
+    key = (projection.proj4_init, tuple(extent), tuple(size_inches), dpi)
+    if key not in _basemap_cache:
+        fig = plt.figure(figsize=size_inches, dpi=dpi)
+        ax = fig.add_axes([0, 0, 1, 1], projection=projection)
+        ax.set_extent(extent, crs=ccrs.PlateCarree())
+        ax.add_feature(cfeature.LAND, facecolor='#f9f9f9', alpha=1.0)
+        ax.add_feature(cfeature.OCEAN, facecolor='#f0f8ff', alpha=1.0)
+        ax.add_feature(cfeature.COASTLINE, linewidth=0.4, color='#404040')
+        ax.add_feature(cfeature.BORDERS, linestyle=':', color='#808080', alpha=0.3)
+        ax.axis('off')
+        fig.canvas.draw()
+        # The equal-aspect axes shrinks inside the figure; keep only its box
+        # so the image covers exactly ax.get_extent()
+        x0, y0, x1, y1 = np.round(ax.bbox.extents).astype(int)
+        height = fig.canvas.buffer_rgba().shape[0]
+        image = np.array(fig.canvas.buffer_rgba())[height - y1:height - y0, x0:x1]
+        _basemap_cache[key] = (image, ax.get_extent())
+        plt.close(fig)
+    return _basemap_cache[key]
+
+
+def project_layers(df, projection, colors=project_colors, arc_points=48):
+    """Project partner coordinates and every project's arcs once, up front."""
+    df = df.dropna(subset=['lon', 'lat']).reset_index(drop=True)
+    projects = [proj for proj in colors if proj in df.columns]
+    lon = df['lon'].to_numpy(dtype=float)
+    lat = df['lat'].to_numpy(dtype=float)
+    xy = projection.transform_points(ccrs.PlateCarree(), lon, lat)[:, :2]
+    funder = (df['Funder'].fillna(0).to_numpy() == 1) if 'Funder' in df.columns else np.zeros(len(df), bool)
+
+    arcs = {}
+    for project, pairs in collaboration_pairs(df, projects).items():
+        segments = []
+        if len(pairs):
+            lines = great_circle_points(lon[pairs[:, 0]], lat[pairs[:, 0]],
+                                        lon[pairs[:, 1]], lat[pairs[:, 1]], n=arc_points)
+            for line in lines:
+                for part in split_antimeridian(line):
+                    segments.append(projection.transform_points(ccrs.PlateCarree(),
+                                                                part[:, 0], part[:, 1])[:, :2])
+        arcs[project] = segments
+
+    return {
+        'xy': xy,
+        'funder': funder,
+        'members': project_members(df, projects, exclude_funders=False),
+        'arcs': arcs,
+    }
+
+
+def draw_project_panel(ax, layers, project, basemap, color):
+    image, image_extent = basemap
+    ax.imshow(image, extent=image_extent, transform=ax.projection, origin='upper',
+              interpolation='nearest', zorder=0)
+    ax.set_extent(image_extent, crs=ax.projection)
+
+    if layers['arcs'][project]:
+        ax.add_collection(LineCollection(layers['arcs'][project], colors=color,
+                                         linewidths=0.4, alpha=0.2, zorder=1))
+    idx = layers['members'][project]
+    funder = layers['funder'][idx]
+    xy = layers['xy'][idx]
+    ax.scatter(xy[~funder, 0], xy[~funder, 1], s=30, c=color, marker='o',
+               edgecolors='white', linewidths=0.6, alpha=0.9, zorder=5)
+    ax.scatter(xy[funder, 0], xy[funder, 1], s=36, c='#000000', marker='^',
+               edgecolors='white', linewidths=0.6, alpha=0.9, zorder=5)
+    ax.set_title(f"{project} ({len(idx)} partners)", fontsize=11, fontweight='bold')
+
+
+def render_facets(df, out='project_facet_maps.png', separate=False, ncols=4,
+                  panel_size=(6, 3.6), extent=(-130, 60, -45, 70), dpi=200,
+                  colors=project_colors):
+    """Draw one map panel per project from a single projection and basemap pass.
+
+    With ``separate=True`` each panel is written to its own file, named after
+    ``out`` with the project appended; otherwise all panels share one figure.
+    """
+    projection = ccrs.Robinson(central_longitude=0)
+    layers = project_layers(df, projection, colors)
+    projects = list(layers['members'])
+    basemap = render_basemap(projection, extent, panel_size, dpi)
+
+    written = []
+    if separate:
+        stem, ext = out.rsplit('.', 1)
+        for project in projects:
+            fig = plt.figure(figsize=panel_size)
+            ax = fig.add_axes([0, 0, 1, 0.92], projection=projection)
+            draw_project_panel(ax, layers, project, basemap, colors[project])
+            path = f"{stem}_{project}.{ext}"
+            fig.savefig(path, dpi=dpi, bbox_inches='tight', facecolor='white')
+            plt.close(fig)
+            written.append(path)
+    else:
+        nrows = math.ceil(len(projects) / ncols)
+        fig, axes = plt.subplots(nrows, ncols,
+                                 figsize=(panel_size[0] * ncols, panel_size[1] * nrows * 1.1),
+                                 subplot_kw={'projection': projection})
+        axes = np.atleast_1d(axes).ravel()
+        for ax, project in zip(axes, projects):
+            draw_project_panel(ax, layers, project, basemap, colors[project])
+        for ax in axes[len(projects):]:
+            ax.set_visible(False)
+        fig.suptitle('Partner Network by Research Programme', fontsize=16, fontweight='bold')
+        fig.savefig(out, dpi=dpi, bbox_inches='tight', facecolor='white')
+        plt.close(fig)
+        written.append(out)
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render one partner map panel per project")
+    parser.add_argument('--csv', default='partners_data_with_coords.csv')
+    parser.add_argument('--out', default='project_facet_maps.png')
+    parser.add_argument('--separate', action='store_true', help="write one file per project")
+    parser.add_argument('--dpi', type=int, default=200)
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.csv)
+    for path in render_facets(df, args.out, separate=args.separate, dpi=args.dpi):
+        print(f"Saved {path}")
@@ -0,0 +1,205 @@
+import argparse
+import csv
+from bisect import bisect_left
+from collections import Counter, deque, namedtuple
+
+from partner_geometry import PROJECTS
+
+Match = namedtuple('Match', 'start end text target kind')
+
+# How project names appear in running text
+PROJECT_ALIASES = {'HIGH_Horizons': ['HIGH Horizons', 'HIGH-Horizons'], 'BioHEAT': ['Bio-HEAT', 'Bio HEAT']}
+
+# Characters of text around a partner mention searched for project mentions
+CO_MENTION_WINDOW = 500
+
+
+def normalize(text):
+    """Lower-case ``text`` and collapse whitespace runs to one space.
+
+    Returns the normalized string and, for each of its characters, the
+    offset of the character it came from, so matches map back to spans.
+    """
+    chars, offsets = [], []
+    space = False
+    for i, c in enumerate(text):
+        if c.isspace():
+            if not space:
+                chars.append(' ')
+                offsets.append(i)
+            space = True
+            continue
+        space = False
+        lower = c.lower()
+        chars.append(lower if len(lower) == 1 else c)
+        offsets.append(i)
+    return ''.join(chars), offsets
+
+
+def _is_acronym(name):
+    # "UCT", "LSHTM", "U Graz": short forms that are only names when capitalised as written
+    return len(name) <= 6 or (any(c.isupper() for c in name) and name.replace(' ', '').isupper())
+
+
+class Gazetteer:
+    """One Aho-Corasick automaton over every known institution name, short name and alias.
+
+    ``scan`` walks a document once and returns non-overlapping, whole-word
+    matches, preferring the leftmost and then the longest candidate.
+    Acronyms and project names match case-sensitively; full names don't.
+    """
+
+    def __init__(self):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        self._patterns = []  # (normalized length, target, kind, exact text or None)
+        self._built = False
+
+    def add(self, name, target, kind, case_sensitive=False):
+        key, _ = normalize(name.strip())
+        if not key:
+            return
+        node = 0
+        for c in key:
+            nxt = self._goto[node].get(c)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][c] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append(len(self._patterns))
+        self._patterns.append((len(key), target, kind, name.strip() if case_sensitive else None))
+        self._built = False
+
+    def build(self):
+        """Compute failure links breadth-first and fold suffix outputs into each node."""
+        queue = deque(self._goto[0].values())
+        for node in queue:
+            self._fail[node] = 0
+        while queue:
+            node = queue.popleft()
+            for c, nxt in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and c not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(c, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+                queue.append(nxt)
+        self._built = True
+        return self
+
+    @classmethod
+    def from_partners(cls, df_or_path, aliases=None, projects=PROJECTS):
+        """Build from the partner table (a DataFrame or CSV path) plus ``{institution: [alias, ...]}``."""
+        if isinstance(df_or_path, str):
+            with open(df_or_path, newline='', encoding='utf-8') as f:
+                rows = list(csv.DictReader(f))
+        else:
+            rows = df_or_path.to_dict(orient='records')
+        gazetteer = cls()
+        for row in rows:
+            name = str(row.get('Institution') or '').strip()
+            if not name:
+                continue
+            gazetteer.add(name, name, 'name')
+            short = row.get('Short_Name')
+            if isinstance(short, str) and short.strip() and short.strip() != name:
+                gazetteer.add(short, name, 'short', case_sensitive=_is_acronym(short.strip()))
+        for name, names in (aliases or {}).items():
+            for alias in names:
+                gazetteer.add(alias, name, 'alias', case_sensitive=_is_acronym(alias.strip()))
+        for project in projects:
+            for alias in [project] + PROJECT_ALIASES.get(project, []):
+                gazetteer.add(alias, project, 'project', case_sensitive=True)
+        return gazetteer.build()
+
+    def scan(self, text):
+        """All whole-word matches in ``text`` as ``Match`` spans over the original string."""
+        if not self._built:
+            self.build()
+        norm, offsets = normalize(text)
+        goto, fail, out, patterns = self._goto, self._fail, self._out, self._patterns
+        candidates = []
+        node = 0
+        for i, c in enumerate(norm):
+            while node and c not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(c, 0)
+            if out[node]:
+                for pid in out[node]:
+                    candidates.append((i + 1 - patterns[pid][0], i + 1, pid))
+
+        # Leftmost-longest, whole words only, exact case where required
+        candidates.sort(key=lambda m: (m[0], m[0] - m[1]))
+        matches = []
+        last_end = 0
+        n = len(norm)
+        for start, end, pid in candidates:
+            if start < last_end:
+                continue
+            if (start > 0 and norm[start - 1].isalnum()) or (end < n and norm[end].isalnum()):
+                continue
+            length, target, kind, exact = patterns[pid]
+            # A project name hyphenated onto the previous word is part of another name ("Bio-HEAT")
+            if kind == 'project' and start > 1 and norm[start - 1] == '-' and norm[start - 2].isalnum():
+                continue
+            begin, finish = offsets[start], offsets[end - 1] + 1
+            if exact is not None and ' '.join(text[begin:finish].split()) != exact:
+                continue
+            matches.append(Match(begin, finish, text[begin:finish], target, kind))
+            last_end = end
+        return matches
+
+    def document_counts(self, text, window=CO_MENTION_WINDOW):
+        """Partner and project mention counts for one document, plus co-mentions.
+
+        ``co_mentions[(institution, project)]`` counts partner mentions with
+        that project named within ``window`` characters.
+        """
+        matches = self.scan(text)
+        partners = Counter(m.target for m in matches if m.kind != 'project')
+        project_hits = [m for m in matches if m.kind == 'project']
+        projects = Counter(m.target for m in project_hits)
+        starts = [m.start for m in project_hits]
+        co_mentions = Counter()
+        for m in matches:
+            if m.kind == 'project':
+                continue
+            lo = bisect_left(starts, m.start - window)
+            hi = bisect_left(starts, m.end + window)
+            for project in {p.target for p in project_hits[lo:hi]}:
+                co_mentions[(m.target, project)] += 1
+        return {'matches': matches, 'partners': partners, 'projects': projects, 'co_mentions': co_mentions}
+
+
+def load_aliases(path):
+    """``{institution: [alias, ...]}`` from a two-column Institution,Alias CSV."""
+    aliases = {}
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            aliases.setdefault(row['Institution'].strip(), []).append(row['Alias'].strip())
+    return aliases
+
+
+if __name__ == "__main__":
+    from pdf_extractor import iter_page_texts, pdf_paths
+
+    parser = argparse.ArgumentParser(description="Find known partners and projects mentioned in proposal PDFs")
+    parser.add_argument('path', help="a PDF or a directory of PDFs")
+    parser.add_argument('--partners', default='partners_cleaned_with_short_names.csv')
+    parser.add_argument('--aliases', help="CSV with Institution,Alias columns")
+    args = parser.parse_args()
+
+    gazetteer = Gazetteer.from_partners(args.partners, load_aliases(args.aliases) if args.aliases else None)
+    documents = {}
+    for pdf_path, _, text in iter_page_texts(pdf_paths(args.path)):
+        documents.setdefault(pdf_path, []).append(text)
+    for pdf_path, pages in documents.items():
+        counts = gazetteer.document_counts('\n'.join(pages))
+        print(f"{pdf_path}: {sum(counts['partners'].values())} partner mentions, "
+              f"{len(counts['partners'])} distinct partners")
+        for (partner, project), n in counts['co_mentions'].most_common(10):
+            print(f"  {partner} + {project}: {n}")
@@ -0,0 +1,298 @@
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+from jinja2 import Template
+from folium.elements import JSCSSMixin
+from folium.map import Layer
+from folium.plugins import MarkerCluster
+
+from partner_geometry import project_bitmask
+
+# Popup field name -> partner table column
+DEFAULT_POPUP_FIELDS = {'name': 'Institution', 'city': 'City', 'country': 'Country'}
+
+# Client-side helpers shared by the layers: look popup rows up in the side
+# table (embedded, or fetched once from a sidecar file) and fill a template
+POPUP_JS = """
+function makePopupLookup(table, url) {
+    var loaded = table ? Promise.resolve(table) : null;
+    return function(id) {
+        if (!loaded) loaded = fetch(url).then(function(r) { return r.json(); });
+        return loaded.then(function(t) {
+            var row = {};
+            t.fields.forEach(function(field, k) {
+                var s = t.rows[id][k];
+                row[field] = s < 0 ? '' : t.strings[s];
+            });
+            return row;
+        });
+    };
+}
+function fillPopupTemplate(template, row, projectsHtml) {
+    return template.replace(/\\{(\\w+)\\}/g, function(_, key) {
+        if (key === 'projects') return projectsHtml;
+        return String(row[key] == null ? '' : row[key]).replace(/[&<>"']/g, function(c) {
+            return {'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'}[c];
+        });
+    });
+}
+function bindLazyPopup(layer, lookup, template, projectNames, options) {
+    layer.bindPopup(function(marker) {
+        var f = marker.feature;
+        var div = document.createElement('div');
+        div.textContent = 'Loading...';
+        lookup(f.id).then(function(row) {
+            div.innerHTML = fillPopupTemplate(template, row, projectNames(f.properties.p));
+            if (layer.getPopup()) layer.getPopup().update();
+        });
+        return div;
+    }, options);
+}
+"""
+
+
+def compact_json(obj):
+    """Serialise without whitespace, safe to inline inside a <script> tag.
+
+    folium re-renders script output through Jinja, so ``{{``, ``{%`` and ``{#``
+    (which JSON itself never produces outside strings) are escaped as well.
+    """
+    text = json.dumps(obj, separators=(',', ':'), ensure_ascii=False).replace('</', '<\\/')
+    return re.sub(r'\{(?=[{%#])', r'\\u007b', text)
+
+
+def _located(df):
+    return df.dropna(subset=['lon', 'lat'])
+
+
+def partner_features(df, projects, properties=None, precision=5):
+    """All partners as one compact GeoJSON FeatureCollection.
+
+    Projects are packed into a single bitmask property ``p`` (bit i = projects[i])
+    and funders into ``f``, so styling can be derived in the browser. Each
+    feature's ``id`` is its row in the popup table. ``properties`` optionally
+    maps extra short property names to the columns they are read from.
+    """
+    df = _located(df)
+    properties = properties or {}
+    masks = project_bitmask(df, projects)
+    funder = df['Funder'].fillna(0).to_numpy() == 1 if 'Funder' in df.columns else np.zeros(len(df), bool)
+    extra = df[list(properties.values())]
+    extra = extra.astype(object).where(extra.notna(), None).to_numpy()
+    features = []
+    for i, (lon, lat, mask, is_funder) in enumerate(zip(df['lon'], df['lat'], masks, funder)):
+        props = dict(zip(properties.keys(), extra[i]))
+        props.update(p=int(mask), f=int(is_funder))
+        features.append({
+            'type': 'Feature',
+            'id': i,
+            'geometry': {'type': 'Point',
+                         'coordinates': [round(float(lon), precision), round(float(lat), precision)]},
+            'properties': props,
+        })
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def popup_table(df, fields=DEFAULT_POPUP_FIELDS):
+    """Columnar popup lookup table with every distinct string stored once.
+
+    Rows line up with the feature ids from ``partner_features``; each cell is
+    an index into ``strings``, or -1 for a missing value.
+    """
+    strings = []
+    index = {}
+    rows = []
+    for values in _located(df)[list(fields.values())].itertuples(index=False):
+        row = []
+        for value in values:
+            if pd.isna(value):
+                row.append(-1)
+                continue
+            value = str(value)
+            if value not in index:
+                index[value] = len(strings)
+                strings.append(value)
+            row.append(index[value])
+        rows.append(row)
+    return {'fields': list(fields.keys()), 'strings': strings, 'rows': rows}
+
+
+class _PartnerLayer(Layer):
+    """Shared setup: projects, colours, features and the popup side table."""
+
+    popup_fields = DEFAULT_POPUP_FIELDS
+    popup_template = ''
+
+    def __init__(self, df, project_colors, name, overlay, control, show,
+                 properties=None, popup_sidecar=None):
+        super().__init__(name=name, overlay=overlay, control=control, show=show)
+        projects = [proj for proj in project_colors if proj in df.columns]
+        fields = {key: col for key, col in self.popup_fields.items() if col in df.columns}
+        table = popup_table(df, fields)
+
+        self.projects_json = compact_json(projects)
+        self.colors_json = compact_json([project_colors[proj] for proj in projects])
+        self.data_json = compact_json(partner_features(df, projects, properties))
+        self.popup_template_json = compact_json(self.popup_template)
+        self.popup_js = POPUP_JS
+        if popup_sidecar:
+            # Fetched on first click; the path must be reachable from the saved HTML
+            with open(popup_sidecar, 'w', encoding='utf-8') as f:
+                f.write(compact_json(table))
+            self.popup_table_json = 'null'
+            self.popup_url_json = compact_json(popup_sidecar.replace(os.sep, '/'))
+        else:
+            self.popup_table_json = compact_json(table)
+            self.popup_url_json = 'null'
+
+
+class PartnerGeoJson(_PartnerLayer):
+    """Partners as one GeoJSON layer, styled client-side on a canvas renderer.
+
+    Marker colour (first project), funder outline and radius (project count)
+    are computed in the browser from each feature's bitmask, so the page holds
+    the data once instead of one inlined marker object per institution. Popup
+    text lives in a separate side table and is only rendered when opened.
+    """
+
+    popup_template = ('<div style="font-family: Arial; min-width: 200px;">'
+                      '<h4>{name}</h4>'
+                      '<b>Location:</b> {city}, {country}<br>'
+                      '<b>Projects:</b><br>{projects}'
+                      '</div>')
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }} = (function() {
+                {{ this.popup_js }}
+                var projects = {{ this.projects_json }};
+                var colors = {{ this.colors_json }};
+                var renderer = L.canvas({padding: 0.5});
+                function projectList(p) {
+                    var names = [];
+                    for (var i = 0; i < projects.length; i++) { if (p & (1 << i)) names.push(projects[i]); }
+                    return names;
+                }
+                var layer = L.geoJSON({{ this.data_json }}, {
+                    filter: function(f) { return f.properties.p > 0; },
+                    pointToLayer: function(f, latlng) {
+                        var names = projectList(f.properties.p);
+                        var funder = f.properties.f === 1;
+                        return L.circleMarker(latlng, {
+                            renderer: renderer,
+                            radius: names.length * 5 + 8,
+                            color: funder ? 'black' : 'white',
+                            weight: funder ? 2 : 1,
+                            fill: true,
+                            fillColor: funder ? 'black' : colors[projects.indexOf(names[0])],
+                            fillOpacity: 0.7
+                        });
+                    }
+                });
+                bindLazyPopup(layer,
+                              makePopupLookup({{ this.popup_table_json }}, {{ this.popup_url_json }}),
+                              {{ this.popup_template_json }},
+                              function(p) { return projectList(p).join('<br>'); },
+                              {maxWidth: 300});
+                return layer;
+            })();
+            {{ this.get_name() }}.addTo({{ this._parent.get_name() }});
+        {% endmacro %}
+    """)
+
+    def __init__(self, df, project_colors, name='Partners', overlay=True, control=True,
+                 show=True, popup_sidecar=None):
+        super().__init__(df, project_colors, name, overlay, control, show,
+                         popup_sidecar=popup_sidecar)
+        self._name = 'PartnerGeoJson'
+
+
+class ProjectFilterLayer(JSCSSMixin, _PartnerLayer):
+    """Partners stored once, clustered once, and filtered by project in the browser.
+
+    Each feature carries its project bitmask; ticking projects in the filter
+    control re-fills a single marker cluster group with the matching markers,
+    instead of keeping a duplicate marker and popup per project. Only the
+    short name travels with the features (for tooltips); popup text comes
+    from the side table when a marker is clicked.
+    """
+
+    popup_fields = {'name': 'Institution', 'short': 'Short_Name', 'city': 'City'}
+    popup_template = ('<b>{name}</b><br>'
+                      'Short Name: {short}<br>'
+                      'City: {city}<br>'
+                      'Projects: {projects}')
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }} = (function() {
+                {{ this.popup_js }}
+                var projects = {{ this.projects_json }};
+                var colors = {{ this.colors_json }};
+                var data = {{ this.data_json }};
+                var cluster = L.markerClusterGroup();
+                var markers = data.features.map(function(f) {
+                    var c = f.geometry.coordinates, p = f.properties;
+                    var first = 0;
+                    while (first < projects.length && !(p.p & (1 << first))) first++;
+                    var marker = L.circleMarker([c[1], c[0]], {
+                        radius: 8, color: 'white', weight: 1, fill: true, fillOpacity: 0.85,
+                        fillColor: first < projects.length ? colors[first] : '#3388ff'
+                    });
+                    marker.mask = p.p;
+                    marker.feature = f;
+                    if (p.short) marker.bindTooltip(String(p.short));
+                    return marker;
+                });
+                bindLazyPopup(cluster,
+                              makePopupLookup({{ this.popup_table_json }}, {{ this.popup_url_json }}),
+                              {{ this.popup_template_json }},
+                              function(p) { return projects.filter(function(_, i) { return p & (1 << i); }).join(', '); },
+                              {maxWidth: 300});
+
+                function apply(selected) {
+                    cluster.clearLayers();
+                    cluster.addLayers(selected === 0 ? markers : markers.filter(function(m) {
+                        return (m.mask & selected) !== 0;
+                    }));
+                }
+
+                var control = L.control({position: 'topright'});
+                control.onAdd = function() {
+                    var div = L.DomUtil.create('div', 'leaflet-control-layers leaflet-control-layers-expanded');
+                    L.DomEvent.disableClickPropagation(div);
+                    var html = '<b>Projects</b><br><small>none ticked = all partners</small>';
+                    projects.forEach(function(name, i) {
+                        html += '<label style="display:block"><input type="checkbox" value="' + (1 << i) + '"> ' +
+                            '<span style="color:' + colors[i] + '">&#9679;</span> ' + name + '</label>';
+                    });
+                    div.innerHTML = html;
+                    div.addEventListener('change', function() {
+                        var selected = 0;
+                        div.querySelectorAll('input:checked').forEach(function(box) { selected |= +box.value; });
+                        apply(selected);
+                    });
+                    return div;
+                };
+
+                apply(0);
+                cluster.filterControl = control;
+                return cluster;
+            })();
+            {{ this.get_name() }}.addTo({{ this._parent.get_name() }});
+            {{ this.get_name() }}.filterControl.addTo({{ this._parent.get_name() }});
+        {% endmacro %}
+    """)
+
+    default_js = MarkerCluster.default_js
+    default_css = MarkerCluster.default_css
+
+    def __init__(self, df, project_colors, name='Partners', overlay=True, control=False,
+                 show=True, popup_sidecar=None):
+        properties = {'short': 'Short_Name'} if 'Short_Name' in df.columns else None
+        super().__init__(df, project_colors, name, overlay, control, show,
+                         properties=properties, popup_sidecar=popup_sidecar)
+        self._name = 'ProjectFilterLayer'
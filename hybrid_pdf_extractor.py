@@ -0,0 +1,193 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from pdf_extractor import (PAGES_PER_CHUNK, extract_page_texts, find_partners, new_partner,
+                           page_count, pdf_paths, save_to_csv)
+
+# Bump when text-layer extraction or OCR preprocessing changes; pattern
+# changes don't need it since the cache holds page text, not matches
+EXTRACTOR_VERSION = 1
+CACHE_DIR = '.pdf_page_cache'
+
+# A text layer counts as usable with at least this many characters, most of them alphanumeric
+MIN_TEXT_CHARS = 40
+MIN_ALNUM_RATIO = 0.5
+# Method reported for scanned pages when poppler or tesseract is missing
+OCR_SKIPPED = 'ocr-skipped'
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def has_text_layer(text):
+    """Whether extracted text looks real rather than empty or garbled."""
+    chars = [c for c in text if not c.isspace()]
+    if len(chars) < MIN_TEXT_CHARS:
+        return False
+    return sum(c.isalnum() for c in chars) / len(chars) >= MIN_ALNUM_RATIO
+
+
+class PageCache:
+    """Per-page extraction results on disk, keyed by (PDF hash, page, extractor version)."""
+
+    def __init__(self, root=CACHE_DIR, version=EXTRACTOR_VERSION):
+        self.root = root
+        self.version = version
+
+    def _path(self, pdf_hash, page, kind):
+        return os.path.join(self.root, pdf_hash, f"v{self.version}", f"{page}.{kind}.json")
+
+    def get(self, pdf_hash, page, kind):
+        try:
+            with open(self._path(pdf_hash, page, kind), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, pdf_hash, page, kind, entry):
+        path = self._path(pdf_hash, page, kind)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+
+def _runs(pages, size):
+    """Group sorted 1-based page numbers into contiguous 0-based [start, stop) runs."""
+    start = prev = None
+    for page in pages:
+        if start is not None and (page != prev + 1 or page - start >= size):
+            yield start - 1, prev
+            start = None
+        if start is None:
+            start = page
+        prev = page
+    if start is not None:
+        yield start - 1, prev
+
+
+def _ocr(pdf_path, page, dpi, lang):
+    """OCR one page; returns (text, None), or (None, reason) when the OCR tools are missing."""
+    # Imported here so text-only PDFs work without poppler/tesseract installed
+    try:
+        from ocr_pdf_extractor import ocr_pages
+        from pdf2image.exceptions import PDFInfoNotInstalledError, PopplerNotInstalledError
+        from pytesseract import TesseractNotFoundError
+    except ImportError as e:
+        return None, str(e)
+    try:
+        return ocr_pages(pdf_path, page, page, dpi, lang)[0][1], None
+    except (PDFInfoNotInstalledError, PopplerNotInstalledError, TesseractNotFoundError) as e:
+        return None, str(e).strip() or type(e).__name__
+
+
+def iter_page_results(path, cache=None, dpi=200, lang='eng', workers=None, hashes=None):
+    """Yield (pdf_path, page_number, method, text) for every page.
+
+    ``path`` is a PDF, a directory of PDFs or a list of PDF paths. Cached
+    pages come straight from disk. The rest are read from the text layer in
+    parallel across all files at once, and only pages without a usable text
+    layer are OCR'd. ``method`` is ``'text'``, ``'ocr'``, or ``'ocr-skipped'``
+    (with empty text) when poppler or tesseract is not installed; skipped
+    pages are not cached, so they are OCR'd once the tools are available.
+    ``hashes`` maps PDF paths to content hashes the caller already has.
+    """
+    cache = cache or PageCache()
+    workers = workers or os.cpu_count() or 1
+    ocr_kind = f"ocr-{dpi}-{lang}"
+    paths = pdf_paths(path) if isinstance(path, str) else list(path)
+    hashes = dict(hashes or {})
+    need_text, need_ocr = [], []
+    for pdf_path in paths:
+        pdf_hash = hashes.get(pdf_path) or file_hash(pdf_path)
+        hashes[pdf_path] = pdf_hash
+        missing = []
+        for page in range(1, page_count(pdf_path) + 1):
+            entry = cache.get(pdf_hash, page, 'text')
+            if entry is None:
+                missing.append(page)
+            elif entry['usable']:
+                yield pdf_path, page, 'text', entry['text']
+            else:
+                ocr = cache.get(pdf_hash, page, ocr_kind)
+                if ocr is None:
+                    need_ocr.append((pdf_path, page))
+                else:
+                    yield pdf_path, page, 'ocr', ocr['text']
+        need_text.extend((pdf_path, start, stop) for start, stop in _runs(missing, PAGES_PER_CHUNK))
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        if need_text:
+            results = pool.map(extract_page_texts, *zip(*need_text))
+            for (pdf_path, _, _), pages in zip(need_text, results):
+                for page, text in pages:
+                    usable = has_text_layer(text)
+                    cache.put(hashes[pdf_path], page, 'text', {'text': text, 'usable': usable})
+                    if usable:
+                        yield pdf_path, page, 'text', text
+                    else:
+                        need_ocr.append((pdf_path, page))
+
+        # Bounded number of OCR pages in flight, emitted as they finish
+        pending = {}
+        skipped = set()
+        queued = iter(need_ocr)
+        while True:
+            for pdf_path, page in queued:
+                pending[pool.submit(_ocr, pdf_path, page, dpi, lang)] = (pdf_path, page)
+                if len(pending) >= 2 * workers:
+                    break
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                pdf_path, page = pending.pop(future)
+                text, error = future.result()
+                if text is None:
+                    if error not in skipped:
+                        skipped.add(error)
+                        print(f"Skipping OCR of scanned pages: {error}", file=sys.stderr)
+                    yield pdf_path, page, OCR_SKIPPED, ''
+                    continue
+                cache.put(hashes[pdf_path], page, ocr_kind, {'text': text})
+                yield pdf_path, page, 'ocr', text
+
+
+def iter_hybrid_partners(path, **kwargs):
+    """Partner rows (with Source, Page and Method) from text-layer and scanned pages alike."""
+    for pdf_path, page, method, text in iter_page_results(path, **kwargs):
+        for name in find_partners(text):
+            partner = new_partner(name)
+            partner.update(Source=pdf_path, Page=page, Method=method)
+            yield partner
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract partners from PDFs, OCRing only pages without a text layer")
+    parser.add_argument('path', help="a PDF or a directory of PDFs")
+    parser.add_argument('--out', default='new_partners.csv')
+    parser.add_argument('--dpi', type=int, default=200, help="OCR rasterization resolution")
+    parser.add_argument('--lang', default='eng', help="tesseract language")
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    def report(partners):
+        for partner in partners:
+            print(f"- {partner['Institution']} ({partner['Source']}, p. {partner['Page']}, {partner['Method']})")
+            yield partner
+
+    count = save_to_csv(report(iter_hybrid_partners(args.path, cache=PageCache(args.cache_dir), dpi=args.dpi,
+                                                    lang=args.lang, workers=args.workers)), args.out)
+    if count:
+        print(f"\n{count} partners saved to {args.out}")
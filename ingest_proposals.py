@@ -0,0 +1,166 @@
+import argparse
+import csv
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from gazetteer import load_aliases
+from hybrid_pdf_extractor import CACHE_DIR, PageCache, file_hash, iter_page_results
+from partner_table import TEXT_COLUMNS, read_table
+from pdf_extractor import find_partners, pdf_paths
+
+PARTNER_TABLE = 'partners_data_with_coords.csv'
+# Extra tables whose names and short names count as already known
+KNOWN_TABLES = ['partners_cleaned_with_short_names.csv']
+PROVENANCE_FILE = 'partners_provenance.csv'
+STATE_FILE = '.ingest_state.json'
+
+PROVENANCE_FIELDS = ['Institution', 'Source_File', 'Source_Page', 'Method', 'Ingested']
+
+
+def name_key(name):
+    """Loose comparison key: case, punctuation, '&' and a leading 'The' don't matter."""
+    key = name.casefold().replace('&', ' and ')
+    key = re.sub(r"[^\w\s]", ' ', key)
+    key = ' '.join(key.split())
+    return key[4:] if key.startswith('the ') else key
+
+
+class NameIndex:
+    """Hash index from name keys (and word-order-free keys) to known institutions."""
+
+    def __init__(self):
+        self._exact = {}
+        self._tokens = {}
+
+    def add(self, name, institution):
+        key = name_key(name)
+        if key:
+            self._exact.setdefault(key, institution)
+            self._tokens.setdefault(' '.join(sorted(key.split())), institution)
+
+    def resolve(self, name):
+        key = name_key(name)
+        return self._exact.get(key) or self._tokens.get(' '.join(sorted(key.split())))
+
+    @classmethod
+    def from_tables(cls, paths, aliases=None):
+        index = cls()
+        for path in paths:
+            if not os.path.exists(path):
+                continue
+            for row in read_table(path)[1]:
+                institution = row.get('Institution', '').strip()
+                if institution:
+                    index.add(institution, institution)
+                    if row.get('Short_Name', '').strip():
+                        index.add(row['Short_Name'], institution)
+        for institution, names in (aliases or {}).items():
+            for alias in names:
+                index.add(alias, institution)
+        return index
+
+
+def split_candidates(text):
+    """Partner names from one 'partner institution:' line."""
+    for part in re.split(r';|\s+\|\s+', text):
+        name = part.strip(" \t.,:-–•*()[]")
+        if 3 <= len(name) <= 150 and any(c.isalpha() for c in name):
+            yield name
+
+
+def _hash_files(paths, workers=None):
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return dict(zip(paths, pool.map(file_hash, paths)))
+
+
+def _ends_with_newline(path):
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        if not f.tell():
+            return True
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) in (b'\n', b'\r')
+
+
+def load_state(path=STATE_FILE):
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+
+def ingest(directory, table=PARTNER_TABLE, known_tables=KNOWN_TABLES, aliases=None,
+           provenance_file=PROVENANCE_FILE, state_file=STATE_FILE, cache_dir=CACHE_DIR,
+           workers=None, dry_run=False):
+    """Extract candidate partners from new or changed PDFs and append the unknown ones.
+
+    PDFs whose content hash is recorded in ``state_file`` are skipped, so an
+    unchanged directory does no extraction and writes nothing. Returns the
+    new partner rows, each with its first (file, page) sighting.
+    """
+    state = load_state(state_file)
+    hashes = _hash_files(pdf_paths(directory), workers)
+    changed = [path for path, digest in hashes.items() if state.get(path) != digest]
+    if not changed:
+        return []
+
+    header, _ = read_table(table)
+    index = NameIndex.from_tables([table] + list(known_tables), aliases)
+    new = {}
+    for pdf_path, page, method, text in iter_page_results(changed, PageCache(cache_dir), workers=workers,
+                                                          hashes=hashes):
+        for line in find_partners(text):
+            for name in split_candidates(line):
+                key = name_key(name)
+                if index.resolve(name) or key in new:
+                    continue
+                new[key] = {'Institution': name, 'Source_File': pdf_path, 'Source_Page': page,
+                            'Method': method, 'Ingested': date.today().isoformat()}
+    if dry_run:
+        return list(new.values())
+
+    if new:
+        # One append per file; existing rows are never rewritten
+        missing_newline = not _ends_with_newline(table)
+        with open(table, 'a', newline='', encoding='utf-8') as f:
+            if missing_newline:
+                # Otherwise the first new row would be glued onto the last existing one
+                f.write('\n')
+            writer = csv.writer(f, lineterminator='\n')
+            writer.writerows([[row['Institution'] if col == 'Institution' else
+                               ('' if col in TEXT_COLUMNS else 0) for col in header]
+                              for row in new.values()])
+        write_header = not os.path.exists(provenance_file)
+        with open(provenance_file, 'a', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=PROVENANCE_FIELDS)
+            if write_header:
+                writer.writeheader()
+            writer.writerows(new.values())
+
+    state.update((path, hashes[path]) for path in changed)
+    with open(state_file, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    return list(new.values())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Add partners named in a directory of proposal PDFs to the partner table")
+    parser.add_argument('directory', help="directory of proposal PDFs (or a single PDF)")
+    parser.add_argument('--table', default=PARTNER_TABLE)
+    parser.add_argument('--aliases', help="CSV with Institution,Alias columns")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--dry-run', action='store_true', help="report new partners without writing anything")
+    args = parser.parse_args()
+
+    rows = ingest(args.directory, args.table, aliases=load_aliases(args.aliases) if args.aliases else None,
+                  workers=args.workers, dry_run=args.dry_run)
+    for row in rows:
+        print(f"+ {row['Institution']} ({row['Source_File']}, p. {row['Source_Page']})")
+    if rows:
+        verb = "Would add" if args.dry_run else "Added"
+        print(f"\n{verb} {len(rows)} new partners to {args.table}; City, Country and coordinates still need filling in")
+    else:
+        print("No new partners")
@@ -0,0 +1,188 @@
+"""Stage timing for the map and data scripts.
+
+Wrap pipeline stages in ``stage()`` blocks or ``@timed`` functions:
+
+    with stage('read csv') as s:
+        df = pd.read_csv(path)
+        s.count(len(df))
+
+Nothing is recorded unless ``PARTNERS_TRACE`` names an output file (or
+``enable()`` is called); disabled stages cost one attribute check. The
+report is a Chrome trace (open it in chrome://tracing or Perfetto) whose
+``stages`` key also lists wall time, CPU time, peak traced memory and item
+counts per stage. Set ``PARTNERS_TRACE_MEMORY=0`` to skip tracemalloc,
+which slows allocation-heavy stages noticeably.
+"""
+import atexit
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+TRACE_ENV = 'PARTNERS_TRACE'
+MEMORY_ENV = 'PARTNERS_TRACE_MEMORY'
+
+
+class _State:
+    enabled = False
+    memory = False
+    path = None
+    origin = 0.0
+    records = []
+    stack = []
+
+
+_state = _State()
+
+
+class _NullStage:
+    """Returned by ``stage()`` when instrumentation is off."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def count(self, n=1, key='items'):
+        pass
+
+
+_NULL = _NullStage()
+
+
+class Stage:
+    def __init__(self, name, counts):
+        self.name = name
+        self.counts = dict(counts)
+        self._peak_seen = 0
+
+    def count(self, n=1, key='items'):
+        """Add ``n`` to this stage's ``key`` counter."""
+        self.counts[key] = self.counts.get(key, 0) + n
+
+    def __enter__(self):
+        if _state.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if _state.stack:
+                parent = _state.stack[-1]
+                parent._peak_seen = max(parent._peak_seen, peak)
+            tracemalloc.reset_peak()
+            self._mem_start = current
+        self.depth = len(_state.stack)
+        _state.stack.append(self)
+        self._cpu = time.process_time()
+        self._wall = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self._wall
+        cpu = time.process_time() - self._cpu
+        _state.stack.pop()
+        record = {
+            'name': self.name,
+            'start': self._wall - _state.origin,
+            'wall': wall,
+            'cpu': cpu,
+            'depth': self.depth,
+            'counts': self.counts,
+            'tid': threading.get_ident(),
+        }
+        if _state.memory:
+            _, peak = tracemalloc.get_traced_memory()
+            peak = max(peak, self._peak_seen)
+            record['peak_bytes'] = max(0, peak - self._mem_start)
+            if _state.stack:
+                parent = _state.stack[-1]
+                parent._peak_seen = max(parent._peak_seen, peak)
+        if exc_type is not None:
+            record['error'] = exc_type.__name__
+        _state.records.append(record)
+        return False
+
+
+def enabled():
+    return _state.enabled
+
+
+def enable(path=None, memory=True):
+    """Start recording; the report is written to ``path`` (if given) at exit."""
+    if _state.enabled:
+        return
+    _state.enabled = True
+    _state.path = path
+    _state.memory = memory
+    _state.origin = time.perf_counter()
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    if path:
+        atexit.register(write_report, path)
+
+
+def stage(name, **counts):
+    """Context manager timing one pipeline stage; ``counts`` seed its item counters."""
+    if not _state.enabled:
+        return _NULL
+    return Stage(name, counts)
+
+
+def timed(name=None):
+    """Decorator form of ``stage()``, named after the function by default."""
+    def decorate(fn):
+        label = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _state.enabled:
+                return fn(*args, **kwargs)
+            with Stage(label, {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def records():
+    return list(_state.records)
+
+
+def chrome_trace(records=None):
+    """Records as Chrome trace 'complete' events, plus the raw stage list."""
+    records = _state.records if records is None else records
+    pid = os.getpid()
+    events = [{'name': 'process_name', 'ph': 'M', 'pid': pid,
+               'args': {'name': os.path.basename(sys.argv[0]) or 'python'}}]
+    for r in records:
+        args = dict(r['counts'], cpu_ms=round(r['cpu'] * 1e3, 3))
+        if 'peak_bytes' in r:
+            args['peak_bytes'] = r['peak_bytes']
+        events.append({'name': r['name'], 'ph': 'X', 'pid': pid, 'tid': r['tid'],
+                       'ts': round(r['start'] * 1e6, 1), 'dur': round(r['wall'] * 1e6, 1), 'args': args})
+    return {'traceEvents': events, 'displayTimeUnit': 'ms', 'stages': records}
+
+
+def summary(records=None):
+    """A plain-text table of stages in start order, indented by nesting."""
+    records = sorted(_state.records if records is None else records, key=lambda r: r['start'])
+    lines = [f"{'stage':<40} {'wall s':>9} {'cpu s':>9} {'peak MB':>9}  counts"]
+    for r in records:
+        peak = f"{r['peak_bytes'] / 1e6:9.1f}" if 'peak_bytes' in r else f"{'-':>9}"
+        counts = ', '.join(f"{k}={v}" for k, v in r['counts'].items())
+        lines.append(f"{'  ' * r['depth'] + r['name']:<40} {r['wall']:9.3f} {r['cpu']:9.3f} {peak}  {counts}")
+    return '\n'.join(lines)
+
+
+def write_report(path=None):
+    path = path or _state.path
+    if not path or not _state.records:
+        return
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(chrome_trace(), f)
+    print(summary(), file=sys.stderr)
+    print(f"Stage trace written to {path}", file=sys.stderr)
+
+
+if os.environ.get(TRACE_ENV):
+    enable(os.environ[TRACE_ENV], memory=os.environ.get(MEMORY_ENV, '1') != '0')
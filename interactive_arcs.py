@@ -0,0 +1,177 @@
+import numpy as np
+from branca.element import Element
+from jinja2 import Template
+from folium.map import Layer
+
+from geojson_layers import compact_json
+from partner_geometry import great_circle_points, site_pairs, split_antimeridian
+
+# (first zoom, tolerance in screen pixels) for each level of detail
+DEFAULT_LODS = [(0, 1.0), (4, 1.0), (7, 0.5)]
+# Arcs kept per project, heaviest site pairs first; bounds page size and build time
+MAX_ARCS = 500
+MAX_ARC_WIDTH = 5
+
+# Shared by every arc layer on the page; added to the document once
+ARC_JS = """
+function decodePolyline(str) {
+    var points = [], index = 0, lat = 0, lng = 0;
+    while (index < str.length) {
+        var b, shift = 0, result = 0;
+        do { b = str.charCodeAt(index++) - 63; result |= (b & 0x1f) << shift; shift += 5; } while (b >= 0x20);
+        lat += (result & 1) ? ~(result >> 1) : (result >> 1);
+        shift = 0; result = 0;
+        do { b = str.charCodeAt(index++) - 63; result |= (b & 0x1f) << shift; shift += 5; } while (b >= 0x20);
+        lng += (result & 1) ? ~(result >> 1) : (result >> 1);
+        points.push([lat / 1e5, lng / 1e5]);
+    }
+    return points;
+}
+"""
+
+
+def simplify_line(points, tolerance):
+    """Douglas-Peucker simplification of an (n, 2) polyline."""
+    if len(points) < 3 or tolerance <= 0:
+        return points
+    keep = np.zeros(len(points), dtype=bool)
+    keep[[0, -1]] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        a, b = points[start], points[end]
+        segment = b - a
+        length = np.hypot(*segment)
+        inner = points[start + 1:end] - a
+        if length == 0:
+            dist = np.hypot(inner[:, 0], inner[:, 1])
+        else:
+            dist = np.abs(segment[0] * inner[:, 1] - segment[1] * inner[:, 0]) / length
+        k = int(np.argmax(dist))
+        if dist[k] > tolerance:
+            mid = start + 1 + k
+            keep[mid] = True
+            stack.extend([(start, mid), (mid, end)])
+    return points[keep]
+
+
+def encode_polyline(latlon, precision=5):
+    """Google encoded-polyline string for an (n, 2) array of lat/lon."""
+    values = np.round(np.asarray(latlon) * 10 ** precision).astype(np.int64)
+    deltas = np.diff(values, axis=0, prepend=[[0, 0]]).ravel()
+    chars = []
+    for value in deltas.tolist():
+        value = ~(value << 1) if value < 0 else value << 1
+        while value >= 0x20:
+            chars.append(chr((0x20 | (value & 0x1f)) + 63))
+            value >>= 5
+        chars.append(chr(value + 63))
+    return ''.join(chars)
+
+
+def project_arcs(df, projects, arc_points=64, lods=DEFAULT_LODS, max_arcs=MAX_ARCS):
+    """Great-circle arcs between the sites sharing each project, simplified and encoded per level of detail.
+
+    Partners are aggregated into sites (see ``site_pairs``) and only the
+    ``max_arcs`` heaviest site pairs per project are kept, so the output
+    no longer grows with the square of the partner count. Arcs are grouped
+    by line width, one pixel more per doubling of the partner pairs they
+    stand for. Returns ``{project: [(min_zoom, [(width, [encoded, ...]),
+    ...]), ...]}``. Tolerances are converted from pixels to degrees at each
+    level's first zoom, measured on equirectangular lon/lat, which is close
+    enough for picking vertices.
+    """
+    lon = df['lon'].to_numpy(dtype=float)
+    lat = df['lat'].to_numpy(dtype=float)
+    arcs = {}
+    for project, (pairs, weights) in site_pairs(df, projects, max_pairs=max_arcs).items():
+        parts = {}
+        if len(pairs):
+            lines = great_circle_points(lon[pairs[:, 0]], lat[pairs[:, 0]],
+                                        lon[pairs[:, 1]], lat[pairs[:, 1]], n=arc_points)
+            widths = np.minimum(1 + np.floor(np.log2(weights)), MAX_ARC_WIDTH).astype(int)
+            for line, width in zip(lines, widths.tolist()):
+                parts.setdefault(width, []).extend(split_antimeridian(line))
+        levels = []
+        for min_zoom, pixels in lods:
+            tolerance = pixels * 360.0 / (256 * 2 ** min_zoom)
+            levels.append((min_zoom, [(width, [encode_polyline(simplify_line(part, tolerance)[:, ::-1])
+                                               for part in parts[width]])
+                                      for width in sorted(parts)]))
+        arcs[project] = levels
+    return arcs
+
+
+class ProjectArcLayer(Layer):
+    """One project's collaboration arcs as canvas-rendered multi-polylines, one per line width.
+
+    The layer swaps to the level of detail matching the current zoom, so
+    only one simplified copy of the arcs is ever on the map.
+    """
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }} = (function(map) {
+                var lods = {{ this.lods_json }};
+                var decoded = {};
+                var group = L.layerGroup();
+                var renderer = L.canvas({padding: 0.5});
+                var current = null;
+                function update() {
+                    var level = 0;
+                    for (var i = 0; i < lods.length; i++) { if (map.getZoom() >= lods[i][0]) level = i; }
+                    if (level === current) return;
+                    current = level;
+                    if (!decoded[level]) {
+                        decoded[level] = lods[level][1].map(function(entry) {
+                            return [entry[0], entry[1].map(decodePolyline)];
+                        });
+                    }
+                    group.clearLayers();
+                    decoded[level].forEach(function(lines) {
+                        group.addLayer(L.polyline(lines[1], {
+                            renderer: renderer, color: {{ this.color_json }},
+                            weight: {{ this.weight }} * lines[0], opacity: {{ this.opacity }}, interactive: false
+                        }));
+                    });
+                }
+                // Nothing is decoded until the layer is switched on
+                group.on('add', update);
+                map.on('zoomend', function() { if (map.hasLayer(group)) update(); });
+                return group;
+            })({{ this._parent.get_name() }});
+            {%- if this.show %}
+            {{ this.get_name() }}.addTo({{ this._parent.get_name() }});
+            {%- endif %}
+        {% endmacro %}
+    """)
+
+    def __init__(self, lods, color, name, weight=1, opacity=0.3, overlay=True,
+                 control=True, show=False):
+        super().__init__(name=name, overlay=overlay, control=control, show=show)
+        self._name = 'ProjectArcLayer'
+        self.lods_json = compact_json(lods)
+        self.color_json = compact_json(color)
+        self.weight = weight
+        self.opacity = opacity
+
+    def render(self, **kwargs):
+        # Same element name for every arc layer, so the decoder is emitted once
+        self.get_root().script.add_child(Element(ARC_JS), name='partner_arc_decoder', index=0)
+        super().render(**kwargs)
+
+
+def add_collaboration_arcs(m, df, project_colors, show=False, **kwargs):
+    """Add one toggleable arc layer per project to folium map ``m``."""
+    df = df.dropna(subset=['lon', 'lat']).reset_index(drop=True)
+    projects = [proj for proj in project_colors if proj in df.columns]
+    layers = []
+    for project, lods in project_arcs(df, projects, **kwargs).items():
+        if not any(groups for _, groups in lods):
+            continue
+        layer = ProjectArcLayer(lods, project_colors[project], f"{project} collaborations", show=show)
+        layer.add_to(m)
+        layers.append(layer)
+    return layers
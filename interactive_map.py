@@ -1,6 +1,13 @@
+import sys
+
 import pandas as pd
 import folium
 from folium import plugins
+from cluster_index import ClusterIndexLayer, build_cluster_index, cluster_chunks
+from geojson_layers import PartnerGeoJson
+from interactive_arcs import add_collaboration_arcs
+from offline_bundle import bundle_file
+from partner_geometry import project_bitmask
 
 # Read the data
 df = pd.read_csv('partners_data_with_coords.csv')
@@ -9,7 +16,8 @@ df = pd.read_csv('partners_data_with_coords.csv')
 m = folium.Map(
     location=[0, 20],  # Center on Africa
     zoom_start=3,
-    tiles='cartodb positron'  # Clean, light style
+    tiles='cartodb positron',  # Clean, light style
+    prefer_canvas=True  # Draw vector markers on one canvas instead of SVG nodes
 )
 
 # Define project colors
@@ -23,54 +31,19 @@ project_colors = {
     'HIGH_Horizons': '#555555'
 }
 
-# Add markers for each institution
-for idx, row in df.iterrows():
-    # Calculate number of projects
-    projects = [proj for proj in project_colors.keys() if row[proj] == 1]
-    num_projects = len(projects)
-    
-    if num_projects > 0:
-        # Determine primary project color
-        color = project_colors[projects[0]]
-        
-        # Create popup content
-        popup_content = f"""
-        <div style="font-family: Arial; min-width: 200px;">
-            <h4>{row['Institution']}</h4>
-            <b>Location:</b> {row['City']}, {row['Country']}<br>
-            <b>Projects:</b><br>
-            {'<br>'.join(projects)}
-        </div>
-        """
-        
-        # Calculate marker size based on number of projects
-        radius = (num_projects * 5) + 8
-        
-        # Different style for funders
-        if row['Funder'] == 1:
-            # Use custom icon for funders
-            folium.CircleMarker(
-                location=[row['lat'], row['lon']],
-                popup=folium.Popup(popup_content, max_width=300),
-                radius=radius,
-                color='black',
-                weight=2,
-                fill=True,
-                fill_color='black',
-                fill_opacity=0.7,
-                icon='info-sign'  # Use a different icon
-            ).add_to(m)
-        else:
-            folium.CircleMarker(
-                location=[row['lat'], row['lon']],
-                popup=folium.Popup(popup_content, max_width=300),
-                radius=radius,
-                color='white',
-                weight=1,
-                fill=True,
-                fill_color=color,
-                fill_opacity=0.7
-            ).add_to(m)
+if '--clusters' in sys.argv:
+    # Zoom-level clusters precomputed here and embedded in the page; the
+    # browser only draws the level and chunks in view
+    projects = [p for p in project_colors if p in df.columns]
+    levels = build_cluster_index(df['lon'], df['lat'], project_bitmask(df, projects))
+    ClusterIndexLayer(project_colors, chunks=cluster_chunks(levels), projects=projects).add_to(m)
+else:
+    # Add all institutions as one GeoJSON layer, styled in the browser
+    PartnerGeoJson(df, project_colors).add_to(m)
+
+# Collaboration arcs, one toggleable layer per project (off until switched on)
+add_collaboration_arcs(m, df, project_colors)
+folium.LayerControl().add_to(m)
 
 # Updated legend with CSS for custom triangle
 legend_html = '''
@@ -122,4 +95,8 @@ title_html = '''
 m.get_root().html.add_child(folium.Element(title_html))
 
 # Save the map
-m.save('interactive_partnership_map.html') 
\ No newline at end of file
+m.save('interactive_partnership_map.html')
+
+# Optionally also write a single-file offline copy (plus .gz) for kiosk machines
+if '--offline' in sys.argv:
+    bundle_file('interactive_partnership_map.html') 
\ No newline at end of file
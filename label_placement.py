@@ -0,0 +1,195 @@
+import hashlib
+import json
+import os
+import warnings
+
+import numpy as np
+import cartopy.crs as ccrs
+
+# Candidate directions tried around each anchor, in order of preference
+CANDIDATE_DIRECTIONS = [(1, 1), (-1, 1), (1, -1), (-1, -1), (1, 0), (-1, 0), (0, 1), (0, -1)]
+
+# Placements kept in the cache file, most recent last; older layouts are dropped
+MAX_CACHED_PLACEMENTS = 16
+
+_placement_cache = {}
+
+
+class GridIndex:
+    """Uniform grid over axis-aligned boxes (x0, y0, x1, y1) for fast overlap tests."""
+
+    def __init__(self, cell_size):
+        self.cell_size = float(cell_size)
+        self.cells = {}
+        self.boxes = []
+
+    def _cells_for(self, box):
+        x0, y0, x1, y1 = box
+        c = self.cell_size
+        for i in range(int(np.floor(x0 / c)), int(np.floor(x1 / c)) + 1):
+            for j in range(int(np.floor(y0 / c)), int(np.floor(y1 / c)) + 1):
+                yield (i, j)
+
+    def insert(self, box):
+        idx = len(self.boxes)
+        self.boxes.append(box)
+        for cell in self._cells_for(box):
+            self.cells.setdefault(cell, []).append(idx)
+
+    def intersects(self, box):
+        x0, y0, x1, y1 = box
+        for cell in self._cells_for(box):
+            for idx in self.cells.get(cell, ()):
+                bx0, by0, bx1, by1 = self.boxes[idx]
+                if x0 < bx1 and bx0 < x1 and y0 < by1 and by0 < y1:
+                    return True
+        return False
+
+
+def estimate_text_size(label, fontsize, pad=1.0):
+    """Approximate a label's (width, height) in points without a renderer."""
+    lines = str(label).split('\n')
+    width = max(len(line) for line in lines) * fontsize * 0.55 + 2 * pad
+    height = len(lines) * fontsize * 1.2 + 2 * pad
+    return width, height
+
+
+def _candidate_box(anchor, size, direction, distance):
+    (ax_, ay), (w, h), (sx, sy) = anchor, size, direction
+    x = ax_ + sx * distance
+    y = ay + sy * distance
+    x0 = x if sx > 0 else (x - w if sx < 0 else x - w / 2)
+    y0 = y if sy > 0 else (y - h if sy < 0 else y - h / 2)
+    return (x0, y0, x0 + w, y0 + h), (x - ax_, y - ay)
+
+
+def place_labels(anchors, sizes, priorities, bounds=None, marker_radius=4.0,
+                 gap=10.0, rings=3, drop_unplaced=False):
+    """Greedily place labels around anchor points, highest priority first.
+
+    ``anchors`` and ``sizes`` are in points. Returns one entry per label:
+    ``None`` if it could not be placed, otherwise a dict with the text
+    ``offset``, horizontal/vertical alignment and whether it needs a leader line.
+    Labels with no free spot go at the first candidate position (overlapping)
+    unless ``drop_unplaced`` is set.
+    """
+    anchors = np.asarray(anchors, dtype=float).reshape(-1, 2)
+    sizes = np.asarray(sizes, dtype=float).reshape(-1, 2)
+    priorities = np.asarray(priorities, dtype=float)
+    cell = max(float(np.median(sizes[:, 0])) if len(sizes) else gap, gap)
+    index = GridIndex(cell)
+
+    # Markers are obstacles too, so labels never cover another institution
+    for x, y in anchors:
+        index.insert((x - marker_radius, y - marker_radius, x + marker_radius, y + marker_radius))
+
+    # Stable sort: ties keep input order, so results are fully deterministic
+    order = np.argsort(-priorities, kind='stable')
+    placements = [None] * len(anchors)
+    for i in order:
+        chosen = None
+        for ring in range(1, rings + 1):
+            for direction in CANDIDATE_DIRECTIONS:
+                box, offset = _candidate_box(anchors[i], sizes[i], direction, gap * ring)
+                if bounds is not None and not (box[0] >= bounds[0] and box[1] >= bounds[1]
+                                               and box[2] <= bounds[2] and box[3] <= bounds[3]):
+                    continue
+                if not index.intersects(box):
+                    chosen = (box, offset, direction, ring)
+                    break
+            if chosen:
+                break
+        if chosen is None:
+            if drop_unplaced:
+                continue
+            box, offset = _candidate_box(anchors[i], sizes[i], CANDIDATE_DIRECTIONS[0], gap)
+            chosen = (box, offset, CANDIDATE_DIRECTIONS[0], 1)
+
+        box, offset, (sx, sy), ring = chosen
+        index.insert(box)
+        placements[i] = {
+            'offset': [float(offset[0]), float(offset[1])],
+            'ha': 'left' if sx > 0 else ('right' if sx < 0 else 'center'),
+            'va': 'bottom' if sy > 0 else ('top' if sy < 0 else 'center'),
+            'leader': ring > 1,
+        }
+    return placements
+
+
+def _placement_key(labels, anchors, sizes, priorities, extent, params):
+    payload = json.dumps({
+        'labels': [str(label) for label in labels],
+        'anchors': np.round(anchors, 2).tolist(),
+        'sizes': np.round(sizes, 2).tolist(),
+        'priorities': np.asarray(priorities, dtype=float).tolist(),
+        'extent': [round(float(v), 4) for v in extent],
+        'params': params,
+    }, sort_keys=True)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def _load_cache_file(cache_file):
+    if cache_file and os.path.exists(cache_file):
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+
+def annotate_partners(ax, lons, lats, labels, priorities, fontsize=7,
+                      bbox=None, arrowprops=None, cache_file=None, zorder=4, **kwargs):
+    """Label partner locations on a cartopy axis without overlaps.
+
+    Set the map extent before calling: anchors are measured in the figure's
+    current layout. Placements are cached by a hash of the data and the extent.
+    """
+    fig = ax.figure
+    # GeoAxes shrink to keep their aspect only when drawn; settle the box first
+    ax.apply_aspect()
+    lons = np.asarray(lons, dtype=float)
+    lats = np.asarray(lats, dtype=float)
+    projected = ax.projection.transform_points(ccrs.PlateCarree(), lons, lats)[:, :2]
+    to_points = 72.0 / fig.dpi
+    anchors = ax.transData.transform(projected) * to_points
+    x0, y0, x1, y1 = ax.bbox.extents * to_points
+    sizes = np.array([estimate_text_size(label, fontsize) for label in labels]).reshape(-1, 2)
+
+    extent = list(ax.get_extent()) + list(fig.get_size_inches()) + [fig.dpi]
+    kwargs.setdefault('drop_unplaced', False)
+    params = dict(fontsize=fontsize, **kwargs)
+    key = _placement_key(labels, anchors, sizes, priorities, extent, params)
+
+    if key not in _placement_cache:
+        disk_cache = _load_cache_file(cache_file)
+        if key in disk_cache:
+            _placement_cache[key] = disk_cache[key]
+        else:
+            _placement_cache[key] = place_labels(anchors, sizes, priorities,
+                                                 bounds=(x0, y0, x1, y1), **kwargs)
+            if cache_file:
+                disk_cache[key] = _placement_cache[key]
+                recent = list(disk_cache)[-MAX_CACHED_PLACEMENTS:]
+                with open(cache_file, 'w', encoding='utf-8') as f:
+                    json.dump({k: disk_cache[k] for k in recent}, f)
+    placements = _placement_cache[key]
+    dropped = sum(placement is None for placement in placements)
+    if dropped:
+        warnings.warn(f"Dropped {dropped} of {len(placements)} labels with no free position", stacklevel=2)
+
+    if bbox is None:
+        bbox = dict(facecolor='white', edgecolor='none', alpha=0.7, pad=1)
+    if arrowprops is None:
+        arrowprops = dict(arrowstyle='-', color='gray', alpha=0.5, linewidth=0.5)
+
+    texts = []
+    for (x, y), label, placement in zip(projected, labels, placements):
+        if placement is None:
+            continue
+        texts.append(ax.annotate(label,
+                                 xy=(x, y), xycoords='data',
+                                 xytext=placement['offset'], textcoords='offset points',
+                                 ha=placement['ha'], va=placement['va'],
+                                 fontsize=fontsize,
+                                 bbox=bbox,
+                                 arrowprops=arrowprops if placement['leader'] else None,
+                                 zorder=zorder))
+    return texts
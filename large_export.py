@@ -0,0 +1,182 @@
+import io
+import os
+import struct
+import zlib
+
+import numpy as np
+from matplotlib import rcParams
+from matplotlib.layout_engine import ConstrainedLayoutEngine
+from matplotlib.transforms import Bbox
+
+
+class PNGStripWriter:
+    """Write an RGB PNG incrementally, one block of rows at a time."""
+
+    def __init__(self, file, width, height, dpi=None, level=6):
+        self.file = file
+        self.width = width
+        self.height = height
+        self.rows_written = 0
+        self._compressor = zlib.compressobj(level)
+        file.write(b'\x89PNG\r\n\x1a\n')
+        self._chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+        if dpi:
+            ppm = int(round(dpi / 0.0254))
+            self._chunk(b'pHYs', struct.pack('>IIB', ppm, ppm, 1))
+
+    def _chunk(self, kind, data):
+        self.file.write(struct.pack('>I', len(data)))
+        self.file.write(kind + data)
+        self.file.write(struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff))
+
+    def write_rows(self, rgb):
+        # Each scanline is prefixed with filter type 0 (None)
+        rows = np.concatenate([np.zeros((rgb.shape[0], 1), dtype=np.uint8),
+                               rgb.reshape(rgb.shape[0], -1)], axis=1)
+        data = self._compressor.compress(rows.tobytes())
+        if data:
+            self._chunk(b'IDAT', data)
+        self.rows_written += rgb.shape[0]
+
+    def close(self):
+        self._chunk(b'IDAT', self._compressor.flush())
+        self._chunk(b'IEND', b'')
+
+
+class TIFFStripWriter:
+    """Write a deflate-compressed RGB baseline TIFF with one TIFF strip per block of rows."""
+
+    def __init__(self, file, width, height, rows_per_strip, dpi=None):
+        self.file = file
+        self.width = width
+        self.height = height
+        self.rows_per_strip = rows_per_strip
+        self.dpi = dpi or 72
+        self.offsets = []
+        self.byte_counts = []
+        file.write(b'II*\x00')
+        file.write(struct.pack('<I', 0))  # IFD offset, patched on close
+
+    def write_rows(self, rgb):
+        data = zlib.compress(np.ascontiguousarray(rgb).tobytes(), 6)
+        self.offsets.append(self.file.tell())
+        self.byte_counts.append(len(data))
+        self.file.write(data)
+        if self.file.tell() % 2:
+            self.file.write(b'\x00')
+
+    def _write_array(self, fmt, values):
+        offset = self.file.tell()
+        self.file.write(struct.pack('<' + fmt * len(values), *values))
+        return offset
+
+    def close(self):
+        # Out-of-line tag values go before the IFD itself
+        bits = self._write_array('H', [8, 8, 8])
+        offsets = self._write_array('I', self.offsets)
+        counts = self._write_array('I', self.byte_counts)
+        resolution = self._write_array('I', [int(round(self.dpi * 100)), 100])
+        if self.file.tell() % 2:
+            self.file.write(b'\x00')
+
+        n = len(self.offsets)
+        entries = [
+            (256, 4, 1, self.width),
+            (257, 4, 1, self.height),
+            (258, 3, 3, bits),
+            (259, 3, 1, 8),  # Adobe deflate
+            (262, 3, 1, 2),  # RGB
+            (273, 4, n, offsets if n > 1 else self.offsets[0]),
+            (277, 3, 1, 3),
+            (278, 4, 1, self.rows_per_strip),
+            (279, 4, n, counts if n > 1 else self.byte_counts[0]),
+            (282, 5, 1, resolution),
+            (283, 5, 1, resolution),
+            (284, 3, 1, 1),
+            (296, 3, 1, 2),  # Inches
+        ]
+        ifd = self.file.tell()
+        self.file.write(struct.pack('<H', len(entries)))
+        for tag, kind, count, value in entries:
+            if kind == 3 and count == 1:
+                self.file.write(struct.pack('<HHIHH', tag, kind, count, value, 0))
+            else:
+                self.file.write(struct.pack('<HHII', tag, kind, count, value))
+        self.file.write(struct.pack('<I', 0))
+        self.file.seek(4)
+        self.file.write(struct.pack('<I', ifd))
+        self.file.seek(0, os.SEEK_END)
+
+
+def figure_bbox(fig, bbox_inches=None, pad_inches=0.1, dpi=None, bbox_extra_artists=None):
+    """The region of ``fig`` (in inches) that savefig would export at ``dpi``.
+
+    For ``'tight'`` this follows savefig's own steps: draw at the export dpi
+    (so axes settle their aspect and text is measured at that resolution),
+    take the tight bbox including ``bbox_extra_artists``, then pad it.
+    """
+    if bbox_inches == 'tight':
+        original_dpi = fig.dpi
+        fig.set_dpi(dpi or original_dpi)
+        try:
+            fig.draw_without_rendering()
+            bbox = fig.get_tightbbox(bbox_extra_artists=bbox_extra_artists)
+        finally:
+            fig.set_dpi(original_dpi)
+        layout_engine = fig.get_layout_engine()
+        if isinstance(layout_engine, ConstrainedLayoutEngine) and pad_inches == 'layout':
+            w_pad, h_pad = layout_engine.get()['w_pad'], layout_engine.get()['h_pad']
+        else:
+            if pad_inches in (None, 'layout'):
+                pad_inches = rcParams['savefig.pad_inches']
+            w_pad = h_pad = pad_inches
+        return bbox.padded(w_pad, h_pad)
+    if bbox_inches is None:
+        width, height = fig.get_size_inches()
+        return Bbox.from_bounds(0, 0, width, height)
+    return bbox_inches
+
+
+def iter_strips(fig, dpi, region, strip_rows=512, **savefig_kwargs):
+    """Render ``region`` of ``fig`` top to bottom as (rows, width, 4) uint8 strips.
+
+    Each strip is a separate savefig call cropped with ``bbox_inches``, so the
+    Agg canvas never holds more than ``strip_rows`` rows at once.
+    """
+    width = int(round(region.width * dpi))
+    height = int(round(region.height * dpi))
+    for top in range(0, height, strip_rows):
+        rows = min(strip_rows, height - top)
+        # Half a pixel of slack so Agg's int() truncation lands on exact sizes;
+        # the extra sliver sits above the strip, which Agg crops away
+        y1 = region.y1 - top / dpi
+        strip = Bbox([[region.x0, y1 - rows / dpi],
+                      [region.x0 + (width + 0.5) / dpi, y1 + 0.5 / dpi]])
+        buf = io.BytesIO()
+        fig.savefig(buf, format='rgba', dpi=dpi, bbox_inches=strip, pad_inches=0, **savefig_kwargs)
+        pixels = np.frombuffer(buf.getbuffer(), dtype=np.uint8)
+        yield pixels.reshape(rows, width, 4)
+
+
+def save_large_figure(fig, path, dpi=300, strip_rows=512, bbox_inches='tight',
+                      pad_inches=0.1, **savefig_kwargs):
+    """Save ``fig`` as PNG or TIFF with peak memory bounded by the strip size."""
+    savefig_kwargs.setdefault('facecolor', 'white')
+    savefig_kwargs.setdefault('edgecolor', 'none')
+    region = figure_bbox(fig, bbox_inches, pad_inches, dpi,
+                         savefig_kwargs.get('bbox_extra_artists'))
+    width = int(round(region.width * dpi))
+    height = int(round(region.height * dpi))
+
+    ext = os.path.splitext(path)[1].lower()
+    with open(path, 'wb') as f:
+        if ext == '.png':
+            writer = PNGStripWriter(f, width, height, dpi=dpi)
+        elif ext in ('.tif', '.tiff'):
+            writer = TIFFStripWriter(f, width, height, strip_rows, dpi=dpi)
+        else:
+            raise ValueError(f"Strip export supports .png and .tif/.tiff, not {ext!r}")
+        for strip in iter_strips(fig, dpi, region, strip_rows, **savefig_kwargs):
+            writer.write_rows(strip[..., :3])
+        writer.close()
+    return width, height
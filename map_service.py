@@ -0,0 +1,386 @@
+import argparse
+import asyncio
+import io
+import multiprocessing
+import os
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from geojson_layers import compact_json, partner_features
+from partner_geometry import PROJECTS
+
+# Named extents (lon_min, lon_max, lat_min, lat_max)
+REGIONS = {
+    'world': (-180, 180, -60, 80),
+    'focus': (-130, 60, -45, 70),
+    'europe': (-25, 45, 34, 72),
+    'africa': (-20, 55, -37, 38),
+    'southern_africa': (10, 41, -35, -15),
+}
+
+PROJECTIONS = {
+    'robinson': lambda ccrs: ccrs.Robinson(central_longitude=0),
+    'platecarree': lambda ccrs: ccrs.PlateCarree(),
+    'mercator': lambda ccrs: ccrs.Mercator(),
+    'equalearth': lambda ccrs: ccrs.EqualEarth(),
+}
+
+# Figure sizes in inches
+SIZES = {
+    'screen': (12, 7),
+    'a4': (11.7, 8.3),
+    'a3': (16.5, 11.7),
+    'poster': (46.8, 33.1),
+}
+
+STYLES = {
+    'scientific': {'land': '#f9f9f9', 'ocean': '#f0f8ff', 'coast': '#404040', 'arc_alpha': 0.15},
+    'plain': {'land': '#eeeeee', 'ocean': '#ffffff', 'coast': '#999999', 'arc_alpha': 0.0},
+}
+
+MAX_DPI = 600
+MAX_PIXELS = 200_000_000
+
+CONTENT_TYPES = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+    'geojson': 'application/geo+json',
+    'json': 'application/json',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+
+class BadRequest(Exception):
+    """A query parameter failed validation; answered with 400 and the message."""
+
+
+class RenderCache:
+    """LRU cache of response bodies, evicting least recently used entries past ``max_bytes``."""
+
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key, body):
+        if len(body) > self.max_bytes:
+            return
+        if key in self._entries:
+            self.size -= len(self._entries.pop(key))
+        self._entries[key] = body
+        self.size += len(body)
+        while self.size > self.max_bytes:
+            _, old = self._entries.popitem(last=False)
+            self.size -= len(old)
+
+    def stats(self):
+        return {'entries': len(self._entries), 'bytes': self.size, 'max_bytes': self.max_bytes,
+                'hits': self.hits, 'misses': self.misses}
+
+
+def _split(values):
+    return sorted({v.strip() for value in values for v in value.split(',') if v.strip()})
+
+
+def parse_filter(query, columns):
+    """Canonical (projects, countries, funders) filter from query parameters."""
+    projects = _split(query.get('projects', []))
+    unknown = [p for p in projects if p not in PROJECTS or p not in columns]
+    if unknown:
+        raise BadRequest(f"unknown projects: {', '.join(unknown)}")
+    countries = _split(query.get('countries', []))
+    funders = query.get('funders', ['1'])[-1] not in ('0', 'false', 'no')
+    return tuple(projects), tuple(countries), funders
+
+
+def parse_extent(query):
+    if 'extent' in query:
+        try:
+            extent = tuple(float(v) for v in query['extent'][-1].split(','))
+        except ValueError:
+            raise BadRequest("extent must be lon_min,lon_max,lat_min,lat_max") from None
+        if len(extent) != 4 or extent[0] >= extent[1] or extent[2] >= extent[3]:
+            raise BadRequest("extent must be lon_min,lon_max,lat_min,lat_max")
+        return extent
+    region = query.get('region', ['focus'])[-1]
+    if region not in REGIONS:
+        raise BadRequest(f"unknown region {region!r} (choose from {', '.join(REGIONS)})")
+    return REGIONS[region]
+
+
+def _choice(query, name, options, default):
+    value = query.get(name, [default])[-1]
+    if value not in options:
+        raise BadRequest(f"unknown {name} {value!r} (choose from {', '.join(options)})")
+    return value
+
+
+def apply_filter(df, partner_filter, extent=None):
+    projects, countries, funders = partner_filter
+    keep = np.ones(len(df), dtype=bool)
+    if projects:
+        keep &= (df[list(projects)].fillna(0).to_numpy() == 1).any(axis=1)
+    if countries and 'Country' in df.columns:
+        keep &= df['Country'].isin(countries).to_numpy()
+    if not funders and 'Funder' in df.columns:
+        keep &= df['Funder'].fillna(0).to_numpy() == 0
+    if extent is not None:
+        lon, lat = df['lon'].to_numpy(dtype=float), df['lat'].to_numpy(dtype=float)
+        keep &= (lon >= extent[0]) & (lon <= extent[1]) & (lat >= extent[2]) & (lat <= extent[3])
+    return df[keep].reset_index(drop=True)
+
+
+def summary_table(df, projects):
+    """Partner counts per country, with one column per project."""
+    projects = [p for p in projects if p in df.columns]
+    table = df.groupby('Country')[projects].sum().astype(int)
+    table.insert(0, 'Partners', df.groupby('Country').size())
+    return table.sort_values('Partners', ascending=False).reset_index()
+
+
+# Worker-side state: each process loads the partner table once per data version
+_worker_data = {}
+
+
+def _load(csv_path, version):
+    if _worker_data.get('version') != (csv_path, version):
+        _worker_data.update(version=(csv_path, version), df=pd.read_csv(csv_path))
+    return _worker_data['df']
+
+
+def _partners(csv_path, version):
+    return _load(csv_path, version).dropna(subset=['lon', 'lat']).reset_index(drop=True)
+
+
+def render_geojson(csv_path, version, partner_filter, extent):
+    """Filtered partners as GeoJSON bytes (runs in a worker process)."""
+    subset = apply_filter(_partners(csv_path, version), partner_filter, extent)
+    projects = [p for p in PROJECTS if p in subset.columns]
+    fields = {k: c for k, c in {'name': 'Institution', 'city': 'City', 'country': 'Country'}.items()
+              if c in subset.columns}
+    return compact_json(partner_features(subset, projects, fields)).encode('utf-8')
+
+
+def render_summary(csv_path, version, partner_filter, extent, fmt):
+    """Per-country summary of the filtered partners as CSV or JSON bytes (runs in a worker process)."""
+    table = summary_table(apply_filter(_partners(csv_path, version), partner_filter, extent), PROJECTS)
+    if fmt == 'csv':
+        return table.to_csv(index=False).encode('utf-8')
+    return compact_json(table.to_dict(orient='records')).encode('utf-8')
+
+
+def render_map(csv_path, version, partner_filter, projection, extent, size, dpi, style, fmt):
+    """Render a filtered partner map to PNG or SVG bytes (runs in a worker process)."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import cartopy.crs as ccrs
+    import cartopy.feature as cfeature
+    from matplotlib.collections import LineCollection
+    from matplotlib.lines import Line2D
+    from facet_maps import project_colors, project_layers
+
+    df = apply_filter(_partners(csv_path, version), partner_filter)
+    selected = partner_filter[0] or [p for p in project_colors if p in df.columns]
+    colors = {p: project_colors[p] for p in selected}
+    look = STYLES[style]
+
+    proj = PROJECTIONS[projection](ccrs)
+    fig = plt.figure(figsize=SIZES[size])
+    ax = fig.add_axes([0.02, 0.02, 0.96, 0.96], projection=proj)
+    ax.set_extent(extent, crs=ccrs.PlateCarree())
+    ax.add_feature(cfeature.LAND, facecolor=look['land'])
+    ax.add_feature(cfeature.OCEAN, facecolor=look['ocean'])
+    ax.add_feature(cfeature.COASTLINE, linewidth=0.5, color=look['coast'])
+    ax.add_feature(cfeature.BORDERS, linestyle=':', color='#808080', alpha=0.3)
+
+    layers = project_layers(df, proj, colors)
+    handles = []
+    for project, color in colors.items():
+        if look['arc_alpha'] and layers['arcs'].get(project):
+            ax.add_collection(LineCollection(layers['arcs'][project], colors=color,
+                                             linewidths=0.5, alpha=look['arc_alpha'], zorder=1))
+        idx = np.asarray(layers['members'].get(project, []), dtype=int)
+        idx = idx[~layers['funder'][idx]]
+        ax.scatter(layers['xy'][idx, 0], layers['xy'][idx, 1], s=40, c=color, edgecolors='white',
+                   linewidths=0.6, alpha=0.85, zorder=5)
+        handles.append(Line2D([0], [0], marker='o', color='w', markerfacecolor=color,
+                              markersize=8, label=f"{project} ({len(idx)})"))
+    funder = layers['funder']
+    if funder.any():
+        ax.scatter(layers['xy'][funder, 0], layers['xy'][funder, 1], s=50, c='#000000', marker='^',
+                   edgecolors='white', linewidths=0.6, zorder=6)
+        handles.append(Line2D([0], [0], marker='^', color='w', markerfacecolor='#000000',
+                              markersize=8, label='Funder'))
+    if handles:
+        ax.legend(handles=handles, loc='lower left', frameon=True, fontsize=9)
+
+    buf = io.BytesIO()
+    fig.savefig(buf, format=fmt, dpi=dpi, facecolor='white')
+    plt.close(fig)
+    return buf.getvalue()
+
+
+class MapService:
+    """Serve filtered GeoJSON, summaries and rendered maps, caching every response body."""
+
+    def __init__(self, csv_path, cache_bytes=256 * 1024 * 1024, workers=None):
+        self.csv_path = csv_path
+        self.cache = RenderCache(cache_bytes)
+        # Spawned, not forked: a forked worker would inherit the open client socket
+        # and keep that connection from closing
+        self.pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        self._inflight = {}
+        self._df = None
+        self._version = None
+
+    async def data(self):
+        """The partner table, reloaded whenever the CSV changes on disk.
+
+        The read runs in a thread so a reload never blocks other requests.
+        """
+        version = os.stat(self.csv_path).st_mtime_ns
+        if version != self._version:
+            loop = asyncio.get_running_loop()
+            df = await loop.run_in_executor(None, pd.read_csv, self.csv_path)
+            self._df = df.dropna(subset=['lon', 'lat']).reset_index(drop=True)
+            self._version = version
+        return self._df, version
+
+    async def _cached(self, key, produce):
+        body = self.cache.get(key)
+        if body is not None:
+            return body, 'hit'
+        # Concurrent requests for the same cold key share one render
+        if key not in self._inflight:
+            self._inflight[key] = asyncio.ensure_future(produce())
+        try:
+            body = await asyncio.shield(self._inflight[key])
+        finally:
+            self._inflight.pop(key, None)
+        self.cache.put(key, body)
+        return body, 'miss'
+
+    async def handle(self, path, query):
+        """Return (status, content_type, body, cache_state) for a GET request."""
+        if path == '/stats':
+            return 200, CONTENT_TYPES['json'], compact_json(self.cache.stats()).encode('utf-8'), None
+
+        df, version = await self.data()
+        loop = asyncio.get_running_loop()
+
+        if path == '/partners.geojson':
+            partner_filter = parse_filter(query, df.columns)
+            extent = parse_extent(query) if 'extent' in query or 'region' in query else None
+            key = ('geojson', version, partner_filter, extent)
+            args = (self.csv_path, version, partner_filter, extent)
+            body, state = await self._cached(key, lambda: loop.run_in_executor(self.pool, render_geojson, *args))
+            return 200, CONTENT_TYPES['geojson'], body, state
+
+        if path in ('/summary.json', '/summary.csv'):
+            partner_filter = parse_filter(query, df.columns)
+            extent = parse_extent(query) if 'extent' in query or 'region' in query else None
+            fmt = path.rsplit('.', 1)[1]
+            key = ('summary', fmt, version, partner_filter, extent)
+            args = (self.csv_path, version, partner_filter, extent, fmt)
+            body, state = await self._cached(key, lambda: loop.run_in_executor(self.pool, render_summary, *args))
+            return 200, CONTENT_TYPES[fmt], body, state
+
+        if path in ('/map.png', '/map.svg'):
+            fmt = path.rsplit('.', 1)[1]
+            partner_filter = parse_filter(query, df.columns)
+            extent = parse_extent(query)
+            projection = _choice(query, 'projection', PROJECTIONS, 'robinson')
+            size = _choice(query, 'size', SIZES, 'screen')
+            style = _choice(query, 'style', STYLES, 'scientific')
+            try:
+                dpi = int(query.get('dpi', ['150'])[-1])
+            except ValueError:
+                raise BadRequest("dpi must be an integer") from None
+            width, height = SIZES[size]
+            if not 10 <= dpi <= MAX_DPI or width * height * dpi * dpi > MAX_PIXELS:
+                raise BadRequest(f"dpi out of range for size {size!r}")
+            if fmt == 'svg':
+                dpi = 72  # vector output; dpi only affects rasterized parts
+            key = ('map', fmt, version, partner_filter, projection, extent, size, dpi, style)
+            args = (self.csv_path, version, partner_filter, projection, extent, size, dpi, style, fmt)
+            body, state = await self._cached(key, lambda: loop.run_in_executor(self.pool, render_map, *args))
+            return 200, CONTENT_TYPES[fmt], body, state
+
+        return 404, 'text/plain; charset=utf-8', b'Not found\n', None
+
+    async def serve_client(self, reader, writer):
+        try:
+            request = await reader.readline()
+            while (await reader.readline()).strip():
+                pass  # headers are not needed
+            try:
+                method, target, _ = request.decode('latin-1').split(' ', 2)
+            except ValueError:
+                status, ctype, body, state = 400, 'text/plain; charset=utf-8', b'Bad request\n', None
+                method = 'GET'
+            else:
+                url = urlsplit(target)
+                if method not in ('GET', 'HEAD'):
+                    status, ctype, body, state = 405, 'text/plain; charset=utf-8', b'Method not allowed\n', None
+                else:
+                    try:
+                        status, ctype, body, state = await self.handle(url.path, parse_qs(url.query))
+                    except BadRequest as e:
+                        status, ctype, body, state = 400, 'text/plain; charset=utf-8', f"{e}\n".encode('utf-8'), None
+                    except Exception:
+                        traceback.print_exc()
+                        status, ctype, body, state = 500, 'text/plain; charset=utf-8', b'Internal server error\n', None
+            reason = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                      500: 'Internal Server Error'}[status]
+            headers = [f"HTTP/1.1 {status} {reason}", f"Content-Type: {ctype}",
+                       f"Content-Length: {len(body)}", "Connection: close"]
+            if state:
+                headers.append(f"X-Cache: {state}")
+            writer.write(('\r\n'.join(headers) + '\r\n\r\n').encode('latin-1'))
+            if method != 'HEAD':
+                writer.write(body)
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def run(self, host, port):
+        server = await asyncio.start_server(self.serve_client, host, port)
+        print(f"Serving partner maps on http://{host}:{port}/ "
+              f"(/partners.geojson, /summary.json|csv, /map.png|svg, /stats)")
+        async with server:
+            await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve filtered partner data and maps over HTTP")
+    parser.add_argument('--csv', default='partners_data_with_coords.csv')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--cache-mb', type=int, default=256, help="memory budget for cached responses")
+    parser.add_argument('--workers', type=int, default=None, help="render processes (default: CPU count)")
+    args = parser.parse_args()
+
+    service = MapService(args.csv, args.cache_mb * 1024 * 1024, args.workers)
+    try:
+        asyncio.run(service.run(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.pool.shutdown(cancel_futures=True)
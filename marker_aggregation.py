@@ -0,0 +1,241 @@
+import numpy as np
+import pandas as pd
+import cartopy.crs as ccrs
+from matplotlib.collections import LineCollection, PatchCollection
+from matplotlib.patches import PathPatch
+from matplotlib.path import Path
+from scipy.spatial import cKDTree
+
+from partner_geometry import great_circle_points, project_bitmask, split_antimeridian
+
+FUNDER_COLOR = '#000000'
+NO_PROJECT_COLOR = '#999999'
+
+
+def overlap_threshold_px(max_pt, dpi):
+    """Aggregation threshold, in output pixels at ``dpi``, that keeps pies of up to ``max_pt`` points radius apart."""
+    return 2 * max_pt * dpi / 72
+
+
+def marker_radius_pt(count, marker_pt=5, merged_pt=6, pt_per_doubling=1, max_pt=9):
+    """Radius in points of a marker standing for ``count`` partners, as drawn by ``draw_aggregated_markers``."""
+    count = np.asarray(count, dtype=float)
+    merged = np.minimum(merged_pt + pt_per_doubling * np.log2(np.maximum(count, 1)), max_pt)
+    return np.where(count > 1, merged, marker_pt)
+
+
+def link_width_pt(count, width_per_doubling=0.4, max_width=3.0):
+    """Line width in points of a link standing for ``count`` partner pairs, as drawn by ``draw_aggregated_links``."""
+    return np.minimum(width_per_doubling * (1 + np.log2(np.maximum(np.asarray(count, dtype=float), 1))), max_width)
+
+
+def _merge_cells(points, weights, r):
+    """Greedy merge of cell centroids within ``r``, heaviest first; returns a group per cell.
+
+    The grid alone lets neighbours on either side of a cell edge stay apart.
+    """
+    tree = cKDTree(points)
+    group = np.full(len(points), -1, dtype=np.int64)
+    for i in np.argsort(-weights, kind='stable'):
+        if group[i] >= 0:
+            continue
+        nb = np.asarray(tree.query_ball_point(points[i], r), dtype=np.int64)
+        group[nb[group[nb] < 0]] = i
+    return np.unique(group, return_inverse=True)[1]
+
+
+def aggregate_markers(ax, df, projects, threshold_px=12, dpi=None, return_inverse=False):
+    """Merge partners that would land within ``threshold_px`` output pixels of each other.
+
+    Points are projected with the axes' projection and binned on a pixel
+    grid over the current extent, then neighbouring cells closer than the
+    threshold are merged, so the number of markers is bounded by the
+    figure's resolution rather than by the table size. ``dpi`` is the
+    resolution the figure will be saved at (default: the figure's).
+    Partners outside the extent are dropped. Returns one row per marker:
+    projected centroid ``x``/``y``, ``count``, ``funders``, members per
+    project, the OR'ed project bitmask and the institution name for
+    single partners. With ``return_inverse`` the marker of each row of
+    ``df`` (-1 when dropped) is returned as well.
+    """
+    projects = [p for p in projects if p in df.columns]
+    lon = pd.to_numeric(df['lon'], errors='coerce').to_numpy(dtype=float)
+    lat = pd.to_numeric(df['lat'], errors='coerce').to_numpy(dtype=float)
+    xy = ax.projection.transform_points(ccrs.PlateCarree(), lon, lat)[:, :2]
+    # GeoAxes shrink to keep their aspect only when drawn; settle the box first
+    ax.apply_aspect()
+    px = ax.transData.transform(xy)
+    box = ax.bbox
+    inside = (np.isfinite(px).all(axis=1) & (px[:, 0] >= box.x0) & (px[:, 0] <= box.x1) &
+              (px[:, 1] >= box.y0) & (px[:, 1] <= box.y1))
+    idx = np.flatnonzero(inside)
+
+    # The threshold is in saved-image pixels; display units are at the figure's dpi
+    cell = threshold_px * ax.figure.dpi / (dpi or ax.figure.dpi)
+    gx = ((px[idx, 0] - box.x0) // cell).astype(np.int64)
+    gy = ((px[idx, 1] - box.y0) // cell).astype(np.int64)
+    _, cell_of, cell_count = np.unique(gx * (int(box.height // cell) + 1) + gy,
+                                       return_inverse=True, return_counts=True)
+    if len(idx):
+        centroids = np.column_stack([np.bincount(cell_of, weights=px[idx, 0]),
+                                     np.bincount(cell_of, weights=px[idx, 1])]) / cell_count[:, None]
+        inverse = _merge_cells(centroids, cell_count, cell)[cell_of]
+    else:
+        inverse = cell_of
+    count = np.bincount(inverse)
+
+    out = pd.DataFrame({
+        'x': np.bincount(inverse, weights=xy[idx, 0]) / count,
+        'y': np.bincount(inverse, weights=xy[idx, 1]) / count,
+        'count': count,
+    })
+    funder = df['Funder'].fillna(0).to_numpy()[idx] == 1 if 'Funder' in df.columns else np.zeros(len(idx), bool)
+    out['funders'] = np.bincount(inverse, weights=funder, minlength=len(count)).astype(np.int64)
+    flags = df[projects].fillna(0).to_numpy()[idx] == 1
+    for j, project in enumerate(projects):
+        out[project] = np.bincount(inverse, weights=flags[:, j], minlength=len(count)).astype(np.int64)
+    mask = np.zeros(len(count), dtype=np.int64)
+    np.bitwise_or.at(mask, inverse, project_bitmask(df.iloc[idx], projects))
+    out['mask'] = mask
+    first = np.full(len(count), -1)
+    first[inverse[::-1]] = idx[::-1]
+    names = df['Institution'].to_numpy()[first] if 'Institution' in df.columns else np.full(len(count), '')
+    out['label'] = np.where(count == 1, names, '')
+    if return_inverse:
+        marker_of = np.full(len(df), -1, dtype=np.int64)
+        marker_of[idx] = inverse
+        return out, marker_of
+    return out
+
+
+def aggregate_links(df, marker_of, projects, exclude_funders=True):
+    """Collaborations per project between aggregated markers.
+
+    Partners sharing a project are linked pairwise; the links are counted
+    per pair of markers instead of drawn one by one, so the work is bounded
+    by the number of markers rather than the square of the table size.
+    Pairs within one marker are dropped. Returns one row per (project,
+    marker i, marker j), i < j, with the number of partner pairs.
+    """
+    eligible = marker_of >= 0
+    if exclude_funders and 'Funder' in df.columns:
+        eligible &= df['Funder'].fillna(0).to_numpy() == 0
+    n = int(marker_of.max()) + 1 if len(marker_of) else 0
+    pieces = []
+    for project in projects:
+        if project not in df.columns:
+            continue
+        members = marker_of[eligible & (df[project].fillna(0).to_numpy() == 1)]
+        counts = np.bincount(members, minlength=n)
+        used = np.flatnonzero(counts)
+        i, j = np.triu_indices(len(used), k=1)
+        pieces.append(pd.DataFrame({'project': project, 'i': used[i], 'j': used[j],
+                                    'count': counts[used[i]] * counts[used[j]]}))
+    if not pieces:
+        return pd.DataFrame(columns=['project', 'i', 'j', 'count'])
+    return pd.concat(pieces, ignore_index=True)
+
+
+def draw_aggregated_links(ax, markers, links, project_colors, width_per_doubling=0.4, max_width=3.0,
+                          alpha=0.3, arc_points=48, zorder=1):
+    """Draw ``aggregate_links`` output as great-circle arcs, one collection per project.
+
+    Line width starts at ``width_per_doubling`` points for a single partner
+    pair and grows by as much each time the pair count doubles, up to
+    ``max_width``.
+    """
+    lonlat = ccrs.PlateCarree().transform_points(ax.projection, markers['x'].to_numpy(dtype=float),
+                                                 markers['y'].to_numpy(dtype=float))[:, :2]
+    artists = []
+    for project, group in links.groupby('project', sort=False):
+        if project not in project_colors or group.empty:
+            continue
+        i, j = group['i'].to_numpy(), group['j'].to_numpy()
+        widths = link_width_pt(group['count'].to_numpy(), width_per_doubling, max_width)
+        lines = great_circle_points(lonlat[i, 0], lonlat[i, 1], lonlat[j, 0], lonlat[j, 1], n=arc_points)
+        segments, segment_widths = [], []
+        for line, width in zip(lines, widths):
+            for part in split_antimeridian(line):
+                segments.append(ax.projection.transform_points(ccrs.PlateCarree(), part[:, 0], part[:, 1])[:, :2])
+                segment_widths.append(width)
+        artists.append(ax.add_collection(LineCollection(segments, colors=project_colors[project],
+                                                        linewidths=segment_widths, alpha=alpha,
+                                                        zorder=zorder)))
+    return artists
+
+
+def _wedges(shares, colors, x, y, r):
+    """Proportional pie wedges centred at (x, y); a lone slice is drawn as a disc."""
+    total = shares.sum()
+    if total == 0:
+        path = Path.unit_circle()
+        return [(Path(path.vertices * r + (x, y), path.codes), NO_PROJECT_COLOR)]
+    if (shares > 0).sum() == 1:
+        path = Path.unit_circle()
+        return [(Path(path.vertices * r + (x, y), path.codes), colors[int(np.argmax(shares))])]
+    wedges, start = [], 0.0
+    for share, color in zip(shares, colors):
+        if share:
+            sweep = 360.0 * share / total
+            path = Path.wedge(start, start + sweep)
+            wedges.append((Path(path.vertices * r + (x, y), path.codes), color))
+            start += sweep
+    return wedges
+
+
+def draw_aggregated_markers(ax, markers, project_colors, marker_pt=5, merged_pt=6, pt_per_doubling=1,
+                            max_pt=9, edgecolor='white', linewidth=0.6, alpha=0.9, zorder=5,
+                            label_fontsize=6):
+    """Draw ``aggregate_markers`` output: singles as markers, merged sites as pies with counts.
+
+    Single partners are circles in their first project's colour (funders are
+    black triangles). Merged markers are pies of their project memberships,
+    with funders as a black slice; their radius grows by ``pt_per_doubling``
+    points each time the member count doubles, up to ``max_pt`` points, and
+    they show the count. Aggregating with a threshold of at least
+    ``overlap_threshold_px(max_pt, dpi)`` (a diameter of ``2 * max_pt``
+    points in output pixels) keeps pies from overlapping.
+    """
+    projects = [p for p in project_colors if p in markers.columns]
+    colors = [project_colors[p] for p in projects] + [FUNDER_COLOR]
+    single = markers['count'].to_numpy() == 1
+    singles = markers[single]
+    merged = markers[~single]
+
+    # Radius in data units: GeoAxes keep an equal aspect, so one scale suffices
+    ax.apply_aspect()
+    pixels_per_unit = abs(ax.transData.transform((1, 0))[0] - ax.transData.transform((0, 0))[0])
+    pixels_per_pt = ax.figure.dpi / 72
+
+    artists = []
+    funder = singles['funders'].to_numpy() > 0
+    if len(singles):
+        shares = singles[projects].to_numpy() if projects else np.zeros((len(singles), 0))
+        first = np.where(shares.any(axis=1), shares.argmax(axis=1) if projects else 0, len(projects) + 1)
+        color = np.array(colors + [NO_PROJECT_COLOR], dtype=object)[first]
+        for is_funder, marker in ((False, 'o'), (True, '^')):
+            rows = funder == is_funder
+            if rows.any():
+                artists.append(ax.scatter(singles['x'].to_numpy()[rows], singles['y'].to_numpy()[rows],
+                                          s=(2 * marker_pt) ** 2, marker=marker,
+                                          c=FUNDER_COLOR if is_funder else list(color[rows]),
+                                          edgecolors=edgecolor, linewidths=linewidth, alpha=alpha,
+                                          zorder=zorder))
+
+    if len(merged):
+        radius_pt = marker_radius_pt(merged['count'].to_numpy(), marker_pt, merged_pt, pt_per_doubling, max_pt)
+        radius = radius_pt * pixels_per_pt / pixels_per_unit
+        shares = np.column_stack([merged[projects].to_numpy(), merged['funders'].to_numpy()])
+        patches, facecolors = [], []
+        for x, y, r, row in zip(merged['x'], merged['y'], radius, shares):
+            for path, color in _wedges(row, colors, x, y, r):
+                patches.append(PathPatch(path))
+                facecolors.append(color)
+        pies = PatchCollection(patches, facecolors=facecolors, edgecolors=edgecolor,
+                               linewidths=linewidth, alpha=alpha, zorder=zorder + 1)
+        ax.add_collection(pies)
+        artists.append(pies)
+        for x, y, count in zip(merged['x'], merged['y'], merged['count']):
+            artists.append(ax.text(x, y, str(count), ha='center', va='center', fontsize=label_fontsize,
+                                   fontweight='bold', color='white', zorder=zorder + 2))
+    return artists
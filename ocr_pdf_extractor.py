@@ -1,44 +1,87 @@
-from pdf2image import convert_from_path
+from pdf2image import convert_from_path, pdfinfo_from_path
 import pytesseract
-import re
-from PIL import Image
-
-def extract_institutional_partners_from_scanned_pdf(pdf_path):
-    # Convert PDF to images
-    pages = convert_from_path(pdf_path)
-    
-    # Initialize a list to store institutional partners
-    partners = []
-    
-    # Process each page
-    for page in pages:
-        # Extract text using OCR
-        text = pytesseract.image_to_string(page)
-        
-        # Look for patterns that might indicate institutional partners
-        partner_patterns = [
-            r"(?i)institutional partner[s]?\s*:\s*([^\n]+)",
-            r"(?i)partner institution[s]?\s*:\s*([^\n]+)",
-            r"(?i)partnering institution[s]?\s*:\s*([^\n]+)"
-        ]
-        
-        for pattern in partner_patterns:
-            matches = re.finditer(pattern, text)
-            for match in matches:
-                partners.append(match.group(1).strip())
-    
-    return partners
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from pdf_extractor import find_partners, new_partner
+
+DEFAULT_DPI = 200
+
+
+def _init_worker():
+    # One tesseract thread per process; the pool provides the parallelism
+    os.environ['OMP_THREAD_LIMIT'] = '1'
+
+
+def ocr_pages(pdf_path, first_page, last_page, dpi=DEFAULT_DPI, lang='eng'):
+    """Rasterize and OCR pages first_page..last_page (1-based, inclusive) in a worker.
+
+    Only this window's images are ever in memory, and they never leave the process.
+    """
+    images = convert_from_path(pdf_path, dpi=dpi, first_page=first_page,
+                               last_page=last_page, grayscale=True)
+    results = []
+    for page_number, image in enumerate(images, start=first_page):
+        results.append((page_number, pytesseract.image_to_string(image, lang=lang)))
+        image.close()
+    return results
+
+
+def iter_ocr_pages(pdf_path, dpi=DEFAULT_DPI, window=1, workers=None, max_pending=None, lang='eng'):
+    """Yield (page_number, text) as OCR finishes, in completion order.
+
+    At most ``max_pending`` windows of ``window`` pages are queued or running
+    at once (default: two per worker), so memory stays constant however long
+    the document is.
+    """
+    pages = pdfinfo_from_path(pdf_path)['Pages']
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or 2 * workers
+    windows = iter(range(1, pages + 1, window))
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        pending = set()
+        while True:
+            for first in windows:
+                last = min(first + window - 1, pages)
+                pending.add(pool.submit(ocr_pages, pdf_path, first, last, dpi, lang))
+                if len(pending) >= max_pending:
+                    break
+            if not pending:
+                return
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from future.result()
+
+
+def iter_scanned_partners(pdf_path, **kwargs):
+    """Stream partner rows (with Source and Page) from a scanned PDF as pages finish."""
+    for page_number, text in iter_ocr_pages(pdf_path, **kwargs):
+        for name in find_partners(text):
+            partner = new_partner(name)
+            partner.update(Source=pdf_path, Page=page_number)
+            yield partner
+
+
+def extract_institutional_partners_from_scanned_pdf(pdf_path, **kwargs):
+    # Partner names in page order
+    partners = sorted(iter_scanned_partners(pdf_path, **kwargs), key=lambda p: p['Page'])
+    return [partner['Institution'] for partner in partners]
+
 
 if __name__ == "__main__":
-    pdf_path = "example.pdf"
+    pdf_path = sys.argv[1] if len(sys.argv) > 1 else "example.pdf"
+    dpi = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_DPI
     try:
-        partners = extract_institutional_partners_from_scanned_pdf(pdf_path)
-        if partners:
-            print("Found institutional partners:")
-            for partner in partners:
-                print(f"- {partner}")
-        else:
+        found = False
+        for partner in iter_scanned_partners(pdf_path, dpi=dpi):
+            if not found:
+                print("Found institutional partners:")
+                found = True
+            print(f"- {partner['Institution']} (p. {partner['Page']})")
+        if not found:
             print("No institutional partners found in the document")
-            
+
     except Exception as e:
-        print(f"An error occurred: {str(e)}") 
\ No newline at end of file
+        print(f"An error occurred: {str(e)}")
@@ -0,0 +1,163 @@
+import argparse
+import base64
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import urllib.parse
+import urllib.request
+
+VENDOR_DIR = 'vendor'
+
+SCRIPT_SRC = re.compile(r'<script\b[^>]*\bsrc="([^"]+)"[^>]*>\s*</script>', re.I)
+STYLESHEET = re.compile(r'<link\b(?=[^>]*\brel="stylesheet")[^>]*\bhref="([^"]+)"[^>]*/?>', re.I)
+INLINE_BLOCK = re.compile(r'<(script|style)\b([^>]*)>(.*?)</\1>', re.I | re.S)
+CSS_URL = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+FONT_FACE_SRC = re.compile(r'src:([^;}]*)')
+
+mimetypes.add_type('font/woff2', '.woff2')
+mimetypes.add_type('font/woff', '.woff')
+mimetypes.add_type('font/ttf', '.ttf')
+mimetypes.add_type('application/vnd.ms-fontobject', '.eot')
+
+
+def vendor_path(url, vendor_dir=VENDOR_DIR):
+    """Where a CDN asset lives once vendored, mirroring its host and path."""
+    parts = urllib.parse.urlsplit(url)
+    return os.path.join(vendor_dir, parts.netloc, *parts.path.lstrip('/').split('/'))
+
+
+def fetch_asset(url, vendor_dir=VENDOR_DIR, timeout=30):
+    """Return an asset's bytes, downloading it into ``vendor_dir`` on first use only."""
+    if url.startswith('//'):
+        url = 'https:' + url
+    path = vendor_path(url, vendor_dir)
+    if not os.path.exists(path):
+        try:
+            with urllib.request.urlopen(url, timeout=timeout) as response:
+                data = response.read()
+        except OSError as e:
+            raise OSError(f"{url} is not vendored in {vendor_dir} and could not be downloaded "
+                          f"({e}); run once on a connected machine") from e
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def _prefer_woff2(css):
+    # Browsers that can run Leaflet all read woff2, so drop the heavier fallbacks
+    def keep(match):
+        entries = re.split(r',(?![^(]*\))', match.group(1))
+        woff2 = [e for e in entries if '.woff2' in e]
+        return 'src:' + ','.join(woff2) if woff2 else match.group(0)
+    return FONT_FACE_SRC.sub(keep, css)
+
+
+def inline_css_urls(css, base_url, vendor_dir=VENDOR_DIR):
+    """Replace fonts and images referenced by a stylesheet with data URIs."""
+    css = _prefer_woff2(css)
+
+    def embed(match):
+        ref = match.group(2).strip()
+        if ref.startswith(('data:', '#')):
+            return match.group(0)
+        url = urllib.parse.urljoin(base_url, ref).split('#')[0].split('?')[0]
+        mime = mimetypes.guess_type(url)[0] or 'application/octet-stream'
+        data = base64.b64encode(fetch_asset(url, vendor_dir)).decode('ascii')
+        return f'url("data:{mime};base64,{data}")'
+    return CSS_URL.sub(embed, css)
+
+
+def minify_script(body):
+    """Compact an inline block without touching its tokens.
+
+    JSON payloads are re-serialised without whitespace; anything else only
+    loses indentation and blank lines.
+    """
+    try:
+        return json.dumps(json.loads(body), separators=(',', ':'), ensure_ascii=False).replace('</', '<\\/')
+    except ValueError:
+        return '\n'.join(line.strip() for line in body.splitlines() if line.strip())
+
+
+def bundle_html(html, vendor_dir=VENDOR_DIR):
+    """Inline every CDN script and stylesheet and drop repeated blocks.
+
+    Returns the bundled page and a summary of what was inlined and removed.
+    Map tiles are still requested from the tile server at view time.
+    """
+    seen = set()
+    stats = {'inlined': 0, 'duplicates': 0}
+
+    def once(kind, content):
+        key = (kind, hashlib.sha256(content.encode('utf-8')).hexdigest())
+        if key in seen:
+            stats['duplicates'] += 1
+            return False
+        seen.add(key)
+        return True
+
+    def script(match):
+        url = match.group(1)
+        if url.startswith('data:') or not once('src', url):
+            return '' if not url.startswith('data:') else match.group(0)
+        body = fetch_asset(url, vendor_dir).decode('utf-8')
+        stats['inlined'] += 1
+        return '<script>' + body.replace('</script', '<\\/script') + '</script>'
+
+    def stylesheet(match):
+        url = match.group(1)
+        if url.startswith('data:') or not once('href', url):
+            return '' if not url.startswith('data:') else match.group(0)
+        css = inline_css_urls(fetch_asset(url, vendor_dir).decode('utf-8'), url, vendor_dir)
+        stats['inlined'] += 1
+        return '<style>' + css.replace('</style', '<\\/style') + '</style>'
+
+    def inline(match):
+        tag, attrs, body = match.groups()
+        if not body.strip():
+            return match.group(0)
+        body = minify_script(body) if tag.lower() == 'script' else body.strip()
+        if not once(tag.lower() + attrs, body):
+            return ''
+        return f'<{tag}{attrs}>{body}</{tag}>'
+
+    # Inline blocks first, so vendored library code is never re-scanned
+    html = INLINE_BLOCK.sub(inline, html)
+    html = SCRIPT_SRC.sub(script, html)
+    html = STYLESHEET.sub(stylesheet, html)
+    return html, stats
+
+
+def bundle_file(path, out=None, vendor_dir=VENDOR_DIR):
+    """Write ``<name>.offline.html`` and a pre-compressed ``.gz`` copy beside it."""
+    if out is None:
+        stem, _ = os.path.splitext(path)
+        out = stem + '.offline.html'
+    with open(path, 'r', encoding='utf-8') as f:
+        html, stats = bundle_html(f.read(), vendor_dir)
+    data = html.encode('utf-8')
+    with open(out, 'wb') as f:
+        f.write(data)
+    # mtime=0 keeps the .gz byte-identical across runs
+    with open(out + '.gz', 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=9, mtime=0) as gz:
+        gz.write(data)
+    stats.update(input_bytes=os.path.getsize(path), output_bytes=len(data),
+                 gzip_bytes=os.path.getsize(out + '.gz'))
+    return out, stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bundle folium/htmlwidget maps into single offline HTML files")
+    parser.add_argument('html', nargs='+', help="HTML maps to bundle")
+    parser.add_argument('--vendor-dir', default=VENDOR_DIR, help="where downloaded CDN assets are kept")
+    args = parser.parse_args()
+
+    for path in args.html:
+        out, stats = bundle_file(path, vendor_dir=args.vendor_dir)
+        print(f"{out}: {stats['inlined']} assets inlined, {stats['duplicates']} duplicates removed, "
+              f"{stats['input_bytes']:,} -> {stats['output_bytes']:,} bytes ({stats['gzip_bytes']:,} gzipped)")
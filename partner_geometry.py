@@ -0,0 +1,109 @@
+import numpy as np
+
+# Project columns shared by the partner tables
+PROJECTS = ['CHAMNHA', 'HEAT', 'ENBEL', 'GHAP', 'HAPI', 'BioHEAT', 'HIGH_Horizons']
+
+EARTH_RADIUS_M = 6378137.0
+MERCATOR_MAX_LAT = 85.0511287798
+
+
+def project_bitmask(df, projects):
+    """Encode each row's project participation as an integer bitmask (bit i = projects[i])."""
+    flags = df[list(projects)].fillna(0).to_numpy() == 1
+    return flags.astype(np.int64) @ np.left_shift(1, np.arange(len(projects), dtype=np.int64))
+
+
+def project_members(df, projects=PROJECTS, exclude_funders=True):
+    """Row positions of each project's members, as index arrays into ``df``."""
+    members = {}
+    eligible = np.ones(len(df), dtype=bool)
+    if exclude_funders and 'Funder' in df.columns:
+        eligible = df['Funder'].fillna(0).to_numpy() == 0
+    for project in projects:
+        if project in df.columns:
+            members[project] = np.flatnonzero((df[project].fillna(0).to_numpy() == 1) & eligible)
+    return members
+
+
+def collaboration_pairs(df, projects=PROJECTS, exclude_funders=True):
+    """Deduplicated (i, j) row-position pairs, i < j, of partners sharing each project.
+
+    The static maps draw every pair twice (A->B and B->A); this keeps one.
+    Pairs at identical coordinates are dropped since they draw nothing.
+    """
+    lon = df['lon'].to_numpy(dtype=float)
+    lat = df['lat'].to_numpy(dtype=float)
+    pairs = {}
+    for project, idx in project_members(df, projects, exclude_funders).items():
+        i, j = np.triu_indices(len(idx), k=1)
+        i, j = idx[i], idx[j]
+        moved = (lon[i] != lon[j]) | (lat[i] != lat[j])
+        pairs[project] = np.column_stack([i[moved], j[moved]])
+    return pairs
+
+
+def site_pairs(df, projects=PROJECTS, exclude_funders=True, decimals=1, max_pairs=None):
+    """Weighted pairs of sites sharing each project, heaviest first.
+
+    Partners are grouped into sites by coordinates rounded to ``decimals``
+    (0.1 degree is roughly 10 km), so a city with many partners yields one
+    endpoint instead of one per partner. Returns ``{project: (pairs,
+    weights)}``: ``pairs`` holds (i, j) row positions of a representative
+    partner per site and ``weights`` the number of partner pairs each site
+    pair stands for. ``max_pairs`` keeps only the heaviest pairs per project.
+    """
+    lon = df['lon'].to_numpy(dtype=float)
+    lat = df['lat'].to_numpy(dtype=float)
+    _, first, site = np.unique(np.column_stack([np.round(lon, decimals), np.round(lat, decimals)]),
+                               axis=0, return_index=True, return_inverse=True)
+    site = site.ravel()
+    out = {}
+    for project, idx in project_members(df, projects, exclude_funders).items():
+        sites, counts = np.unique(site[idx], return_counts=True)
+        if max_pairs is not None and len(sites) > max_pairs + 1:
+            # Any pair with a site outside the max_pairs + 1 busiest is outweighed by
+            # max_pairs pairs among them, so only those sites need pairing
+            busiest = np.sort(np.argsort(-counts, kind='stable')[:max_pairs + 1])
+            sites, counts = sites[busiest], counts[busiest]
+        i, j = np.triu_indices(len(sites), k=1)
+        weights = counts[i] * counts[j]
+        if max_pairs is not None and len(weights) > max_pairs:
+            keep = np.argpartition(-weights, max_pairs - 1)[:max_pairs]
+            i, j, weights = i[keep], j[keep], weights[keep]
+        order = np.argsort(-weights, kind='stable')
+        pairs = np.column_stack([first[sites[i[order]]], first[sites[j[order]]]])
+        out[project] = (pairs.reshape(-1, 2), weights[order])
+    return out
+
+
+def great_circle_points(lon1, lat1, lon2, lat2, n=64):
+    """Vectorized great-circle interpolation; returns (pairs, n, 2) arrays of lon/lat."""
+    lon1, lat1, lon2, lat2 = (np.radians(np.atleast_1d(np.asarray(a, dtype=float)))
+                              for a in (lon1, lat1, lon2, lat2))
+    p1 = np.stack([np.cos(lat1) * np.cos(lon1), np.cos(lat1) * np.sin(lon1), np.sin(lat1)], axis=-1)
+    p2 = np.stack([np.cos(lat2) * np.cos(lon2), np.cos(lat2) * np.sin(lon2), np.sin(lat2)], axis=-1)
+    omega = np.arccos(np.clip(np.sum(p1 * p2, axis=-1), -1.0, 1.0))[:, None, None]
+    t = np.linspace(0.0, 1.0, n)[None, :, None]
+    sin_omega = np.sin(omega)
+    safe = np.where(sin_omega == 0, 1.0, sin_omega)
+    w1 = np.where(sin_omega == 0, 1 - t, np.sin((1 - t) * omega) / safe)
+    w2 = np.where(sin_omega == 0, t, np.sin(t * omega) / safe)
+    points = w1 * p1[:, None, :] + w2 * p2[:, None, :]
+    lon = np.degrees(np.arctan2(points[..., 1], points[..., 0]))
+    lat = np.degrees(np.arctan2(points[..., 2], np.hypot(points[..., 0], points[..., 1])))
+    return np.stack([lon, lat], axis=-1)
+
+
+def split_antimeridian(line):
+    """Split an (n, 2) lon/lat polyline wherever it jumps across the antimeridian."""
+    jumps = np.flatnonzero(np.abs(np.diff(line[:, 0])) > 180) + 1
+    return [part for part in np.split(line, jumps) if len(part) > 1]
+
+
+def to_web_mercator(lon, lat):
+    """Project lon/lat degrees to EPSG:3857 metres."""
+    lon = np.asarray(lon, dtype=float)
+    lat = np.clip(np.asarray(lat, dtype=float), -MERCATOR_MAX_LAT, MERCATOR_MAX_LAT)
+    x = EARTH_RADIUS_M * np.radians(lon)
+    y = EARTH_RADIUS_M * np.log(np.tan(np.pi / 4 + np.radians(lat) / 2))
+    return x, y
@@ -0,0 +1,22 @@
+import csv
+
+# Columns left blank on new rows; every other column is a 0/1 flag
+TEXT_COLUMNS = {'Institution', 'City', 'Country', 'lon', 'lat', 'Short_Name'}
+
+
+def read_table(path):
+    """Header and rows of a partner CSV.
+
+    Some rows carry an unquoted comma inside the institution name; the
+    surplus leading fields are folded back into the first column.
+    """
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        rows = []
+        for record in reader:
+            extra = len(record) - len(header)
+            if extra > 0:
+                record = [','.join(record[:extra + 1])] + record[extra + 1:]
+            rows.append(dict(zip(header, record)))
+    return header, rows
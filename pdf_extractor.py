@@ -1,78 +1,135 @@
 import PyPDF2
+import os
 import re
+import itertools
 import csv
-from typing import List, Dict
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Tuple
 
-def extract_institutional_partners(pdf_path) -> List[Dict]:
-    # Open the PDF file in binary read mode
+# One alternation instead of a pattern per phrasing, compiled once
+PARTNER_PATTERN = re.compile(
+    r"(?i)(?:institutional partner|partner institution|partnering institution)s?\s*:\s*([^\n]+)")
+
+FIELDNAMES = ["Institution", "City", "Country", "CHAMNHA", "HEAT", "HIGH",
+              "ENBEL", "GHAP", "HAPI", "BioHEAT", "HIGH_Horizons"]
+
+# Pages handed to a worker at a time; each chunk opens the PDF once
+PAGES_PER_CHUNK = 8
+
+
+def new_partner(name: str) -> Dict:
+    # City, Country and projects need to be filled manually
+    partner = dict.fromkeys(FIELDNAMES, 0)
+    partner.update(Institution=name, City="", Country="")
+    return partner
+
+
+def find_partners(text: str) -> Iterator[str]:
+    for match in PARTNER_PATTERN.finditer(text):
+        yield match.group(1).strip()
+
+
+def pdf_paths(path: str) -> List[str]:
+    """A single PDF, or every PDF under a directory, in sorted order."""
+    if not os.path.isdir(path):
+        return [path]
+    found = []
+    for root, _, files in os.walk(path):
+        found.extend(os.path.join(root, name) for name in files if name.lower().endswith('.pdf'))
+    return sorted(found)
+
+
+def page_count(pdf_path: str) -> int:
     with open(pdf_path, 'rb') as file:
-        # Create a PDF reader object
-        pdf_reader = PyPDF2.PdfReader(file)
-        
-        # Initialize a list to store institutional partners
-        partners = []
-        
-        # Extract text from each page and look for institutional partners
-        for page in pdf_reader.pages:
-            text = page.extract_text()
-            
-            # Look for patterns that might indicate institutional partners
-            # Adjust these patterns based on your PDF format
-            partner_patterns = [
-                r"(?i)institutional partner[s]?\s*:\s*([^\n]+)",
-                r"(?i)partner institution[s]?\s*:\s*([^\n]+)",
-                r"(?i)partnering institution[s]?\s*:\s*([^\n]+)"
-            ]
-            
-            for pattern in partner_patterns:
-                matches = re.finditer(pattern, text)
-                for match in matches:
-                    partner_name = match.group(1).strip()
-                    # Create a dictionary for each partner
-                    partner_dict = {
-                        "Institution": partner_name,
-                        "City": "",  # These would need to be filled manually
-                        "Country": "",
-                        "CHAMNHA": 0,
-                        "HEAT": 0,
-                        "HIGH": 0,
-                        "ENBEL": 0,
-                        "GHAP": 0,
-                        "HAPI": 0,
-                        "BioHEAT": 0,
-                        "HIGH_Horizons": 0
-                    }
-                    partners.append(partner_dict)
-        
-        return partners
-
-def save_to_csv(partners: List[Dict], output_file: str = "new_partners.csv"):
-    if not partners:
-        print("No partners found to save")
+        return len(PyPDF2.PdfReader(file).pages)
+
+
+def extract_page_texts(pdf_path: str, start: int, stop: int) -> List[Tuple[int, str]]:
+    """Text of pages [start, stop) as (1-based page number, text); runs in a worker."""
+    with open(pdf_path, 'rb') as file:
+        reader = PyPDF2.PdfReader(file)
+        return [(i + 1, reader.pages[i].extract_text() or "") for i in range(start, stop)]
+
+
+def _chunks(paths: Iterable[str], pages_per_chunk: int):
+    for pdf_path in paths:
+        n = page_count(pdf_path)
+        for start in range(0, n, pages_per_chunk):
+            yield pdf_path, start, min(start + pages_per_chunk, n)
+
+
+def iter_page_texts(paths: Iterable[str], workers=None,
+                    pages_per_chunk: int = PAGES_PER_CHUNK) -> Iterator[Tuple[str, int, str]]:
+    """Yield (pdf_path, page_number, text) in document order.
+
+    Page chunks from every PDF share one process pool, so a directory keeps
+    all cores busy; results stream back in order as chunks complete.
+    """
+    chunks = list(_chunks(paths, pages_per_chunk))
+    if workers == 1 or len(chunks) <= 1:
+        results = (extract_page_texts(*chunk) for chunk in chunks)
+        for (pdf_path, _, _), pages in zip(chunks, results):
+            for page_number, text in pages:
+                yield pdf_path, page_number, text
         return
-        
-    fieldnames = ["Institution", "City", "Country", "CHAMNHA", "HEAT", "HIGH", 
-                  "ENBEL", "GHAP", "HAPI", "BioHEAT", "HIGH_Horizons"]
-    
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(extract_page_texts, *zip(*chunks))
+        for (pdf_path, _, _), pages in zip(chunks, results):
+            for page_number, text in pages:
+                yield pdf_path, page_number, text
+
+
+def iter_institutional_partners(path: str, workers=None) -> Iterator[Dict]:
+    """Stream partner rows from a PDF or a directory of PDFs, page by page.
+
+    Each row also records its ``Source`` file and ``Page``.
+    """
+    for pdf_path, page_number, text in iter_page_texts(pdf_paths(path), workers):
+        for name in find_partners(text):
+            partner = new_partner(name)
+            partner.update(Source=pdf_path, Page=page_number)
+            yield partner
+
+
+def extract_institutional_partners(pdf_path, workers=None) -> List[Dict]:
+    return list(iter_institutional_partners(pdf_path, workers))
+
+
+def save_to_csv(partners: Iterable[Dict], output_file: str = "new_partners.csv") -> int:
+    """Write partners as they arrive; returns how many were written.
+
+    An existing ``output_file`` is left untouched when there is nothing to write.
+    """
+    partners = iter(partners)
+    first = next(partners, None)
+    if first is None:
+        print("No partners found to save")
+        return 0
+    count = 0
     with open(output_file, 'w', newline='', encoding='utf-8') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+        writer = csv.DictWriter(csvfile, fieldnames=FIELDNAMES, extrasaction='ignore')
         writer.writeheader()
-        writer.writerows(partners)
+        for partner in itertools.chain([first], partners):
+            writer.writerow(partner)
+            count += 1
+    return count
+
 
 if __name__ == "__main__":
-    pdf_path = "example.pdf"
+    # A PDF or a directory of PDFs
+    pdf_path = sys.argv[1] if len(sys.argv) > 1 else "example.pdf"
     try:
-        partners = extract_institutional_partners(pdf_path)
-        if partners:
-            print("Found institutional partners:")
+        def report(partners):
             for partner in partners:
-                print(f"- {partner['Institution']}")
-            
-            # Save to CSV
-            save_to_csv(partners)
+                print(f"- {partner['Institution']} ({partner['Source']}, p. {partner['Page']})")
+                yield partner
+
+        print("Scanning for institutional partners:")
+        if save_to_csv(report(iter_institutional_partners(pdf_path))):
             print(f"\nPartners saved to new_partners.csv")
         else:
             print("No institutional partners found in the document")
-            
+
     except Exception as e:
-        print(f"An error occurred: {str(e)}")
\ No newline at end of file
+        print(f"An error occurred: {str(e)}")
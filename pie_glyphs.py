@@ -0,0 +1,82 @@
+import numpy as np
+import cartopy.crs as ccrs
+from matplotlib.path import Path
+from matplotlib.patches import PathPatch
+from matplotlib.collections import PatchCollection
+
+from partner_geometry import project_bitmask
+
+
+class PieGlyphCache:
+    """Unit-radius pie wedges keyed by project bitmask.
+
+    There are at most 2**len(projects) distinct project combinations, so each
+    glyph is built once and reused by every institution sharing that mix.
+    """
+
+    def __init__(self, project_colors):
+        self.projects = list(project_colors.keys())
+        self.colors = list(project_colors.values())
+        self._glyphs = {}
+
+    def get(self, mask):
+        mask = int(mask)
+        if mask not in self._glyphs:
+            members = [i for i in range(len(self.projects)) if mask & (1 << i)]
+            if len(members) == 1:
+                # A full wedge would draw a radial seam; use a plain disc instead
+                self._glyphs[mask] = [(Path.unit_circle(), self.colors[members[0]])]
+            else:
+                step = 360.0 / len(members) if members else 0.0
+                self._glyphs[mask] = [
+                    (Path.wedge(k * step, (k + 1) * step), self.colors[i])
+                    for k, i in enumerate(members)
+                ]
+        return self._glyphs[mask]
+
+    def __len__(self):
+        return len(self._glyphs)
+
+
+def add_pie_glyph_layer(ax, df, project_colors, cache=None, base_extent=2.0,
+                        extent_per_project=0.4, edgecolor='white', linewidth=1,
+                        zorder=3):
+    """Draw one pie glyph per institution as a single PatchCollection on a cartopy axis.
+
+    Glyph radius follows the old raster markers: ``base_extent`` degrees plus
+    ``extent_per_project`` per project, converted to map units at each location.
+    """
+    projects = [proj for proj in project_colors if proj in df.columns]
+    if cache is None:
+        cache = PieGlyphCache({proj: project_colors[proj] for proj in projects})
+    masks = project_bitmask(df, projects)
+    keep = masks > 0
+    if not keep.any():
+        return None
+
+    lon = df['lon'].to_numpy(dtype=float)[keep]
+    lat = df['lat'].to_numpy(dtype=float)[keep]
+    masks = masks[keep]
+    counts = np.array([bin(int(m)).count('1') for m in masks])
+    extent = base_extent + extent_per_project * counts
+
+    # Project centres once, and a point one glyph-radius east to get the local scale
+    geodetic = ccrs.PlateCarree()
+    centres = ax.projection.transform_points(geodetic, lon, lat)[:, :2]
+    east = ax.projection.transform_points(geodetic, lon + extent, lat)[:, :2]
+    radii = np.hypot(*(east - centres).T)
+
+    patches = []
+    facecolors = []
+    for (x, y), r, mask in zip(centres, radii, masks):
+        for path, color in cache.get(mask):
+            patches.append(PathPatch(Path(path.vertices * r + (x, y), path.codes)))
+            facecolors.append(color)
+
+    collection = PatchCollection(patches,
+                                 facecolors=facecolors,
+                                 edgecolors=edgecolor,
+                                 linewidths=linewidth,
+                                 zorder=zorder)
+    ax.add_collection(collection)
+    return collection
@@ -0,0 +1,191 @@
+import argparse
+import ast
+import csv
+import hashlib
+import json
+import os
+import subprocess
+import sys
+
+PROJECT_COLUMNS = ['CHAMNHA', 'HEAT', 'HIGH', 'ENBEL', 'GHAP', 'HAPI', 'BioHEAT', 'HIGH_Horizons']
+MAP_COLUMNS = ['Institution', 'Funder', 'lon', 'lat'] + PROJECT_COLUMNS
+
+# Data, style files, outputs and the manifest are all relative to the repo,
+# not the working directory; renderers are run from here too
+SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+MANIFEST_FILE = os.path.join(SOURCE_DIR, 'render_manifest.json')
+
+# Each renderer lists the data it reads (file, columns, optional row filter)
+# and the outputs it produces; the files that define its style are derived
+# from the script's local imports below
+RENDERERS = {
+    'publication_quality_map': {
+        'data': 'partners_data_with_coords.csv',
+        'columns': MAP_COLUMNS,
+        'outputs': ['publication_quality_map.png'],
+    },
+    'enhanced_publication_map': {
+        'data': 'partners_data_with_coords.csv',
+        'columns': MAP_COLUMNS,
+        'outputs': ['global_research_network.pdf', 'global_research_network.png'],
+    },
+    'scientific_publication_map': {
+        'data': 'partners_data_with_coords.csv',
+        'columns': MAP_COLUMNS,
+        'outputs': ['scientific_network_map.pdf', 'scientific_network_map.png'],
+    },
+    'simplified_map': {
+        'data': 'partners_data_with_coords.csv',
+        'columns': MAP_COLUMNS,
+        'outputs': ['simplified_network_map.pdf', 'simplified_network_map.png'],
+    },
+    'geographic_map': {
+        'data': 'partners_data_with_coords.csv',
+        'columns': MAP_COLUMNS,
+        'outputs': ['geographic_partners_map.png'],
+    },
+    'enhanced_geographic_map': {
+        'data': 'partners_data_with_coords.csv',
+        'columns': MAP_COLUMNS,
+        'outputs': ['enhanced_geographic_partners_map.png'],
+    },
+    'map': {
+        'data': 'partners_data.csv',
+        'columns': ['Institution', 'Country', 'Funder'] + PROJECT_COLUMNS,
+        'outputs': ['global_partners_network.png'],
+    },
+    'facet_maps': {
+        'data': 'partners_data_with_coords.csv',
+        'columns': MAP_COLUMNS,
+        'outputs': ['project_facet_maps.png'],
+    },
+    'interactive_map': {
+        'data': 'partners_data_with_coords.csv',
+        'columns': ['Institution', 'City', 'Country'] + MAP_COLUMNS[1:],
+        'outputs': ['interactive_partnership_map.html'],
+    },
+    'Johannesburg_partners': {
+        'data': 'partners_cleaned_with_short_names.csv',
+        'columns': ['Institution', 'Short_Name', 'City', 'lon', 'lat'] + PROJECT_COLUMNS,
+        'rows': ('Country', 'South Africa'),
+        'outputs': ['south_africa_partners_map_by_project.html'],
+    },
+}
+
+
+def local_imports(path, source_dir=SOURCE_DIR):
+    """Repo modules ``path`` imports, directly or through other repo modules."""
+    found, pending = [], [path]
+    while pending:
+        with open(os.path.join(source_dir, pending.pop()), encoding='utf-8') as f:
+            tree = ast.parse(f.read())
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                names = [node.module]
+            else:
+                continue
+            for name in names:
+                module = name.split('.')[0] + '.py'
+                if module != path and module not in found and os.path.exists(os.path.join(source_dir, module)):
+                    found.append(module)
+                    pending.append(module)
+    return sorted(found)
+
+
+for _name, _spec in RENDERERS.items():
+    _spec['style'] = [f'{_name}.py'] + local_imports(f'{_name}.py')
+
+
+def data_hash(path, columns, rows=None):
+    """Hash only the columns (and rows) of a CSV that a renderer reads."""
+    digest = hashlib.sha256()
+    with open(os.path.join(SOURCE_DIR, path), newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = [name.strip() for name in next(reader)]
+        keep = [header.index(col) for col in columns if col in header]
+        digest.update(json.dumps([header[i] for i in keep]).encode('utf-8'))
+        filter_idx = header.index(rows[0]) if rows and rows[0] in header else None
+        for record in reader:
+            if filter_idx is not None and (filter_idx >= len(record) or record[filter_idx] != rows[1]):
+                continue
+            digest.update(json.dumps([record[i] if i < len(record) else '' for i in keep]).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def style_hash(paths):
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(path.encode('utf-8'))
+        with open(os.path.join(SOURCE_DIR, path), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def renderer_hashes(spec):
+    return {
+        'data_hash': data_hash(spec['data'], spec['columns'], spec.get('rows')),
+        'style_hash': style_hash(spec['style']),
+    }
+
+
+def load_manifest(path=MANIFEST_FILE):
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+
+def save_manifest(manifest, path=MANIFEST_FILE):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+
+def is_up_to_date(name, spec, manifest, hashes):
+    for output in spec['outputs']:
+        entry = manifest.get(output)
+        if not os.path.exists(os.path.join(SOURCE_DIR, output)) or entry is None:
+            return False
+        if entry.get('renderer') != name or any(entry.get(k) != v for k, v in hashes.items()):
+            return False
+    return True
+
+
+def run_renderers(names=None, force=False, dry_run=False, manifest_path=MANIFEST_FILE):
+    """Run each renderer whose data subset or style changed since its outputs were made."""
+    manifest = load_manifest(manifest_path)
+    results = {}
+    for name in names or RENDERERS:
+        spec = RENDERERS[name]
+        hashes = renderer_hashes(spec)
+        if not force and is_up_to_date(name, spec, manifest, hashes):
+            results[name] = 'skipped'
+            continue
+        if dry_run:
+            results[name] = 'stale'
+            continue
+
+        proc = subprocess.run([sys.executable, f"{name}.py"], cwd=SOURCE_DIR)
+        if proc.returncode != 0:
+            results[name] = 'failed'
+            continue
+        for output in spec['outputs']:
+            manifest[output] = dict(renderer=name, **hashes)
+        save_manifest(manifest, manifest_path)
+        results[name] = 'rendered'
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-render only the maps whose inputs changed")
+    parser.add_argument('renderers', nargs='*', help="renderers to consider (default: all)")
+    parser.add_argument('--force', action='store_true', help="re-render even if hashes are unchanged")
+    parser.add_argument('--dry-run', action='store_true', help="only report which renderers are stale")
+    args = parser.parse_args()
+    unknown = sorted(set(args.renderers) - set(RENDERERS))
+    if unknown:
+        parser.error(f"unknown renderers: {', '.join(unknown)} (choose from {', '.join(RENDERERS)})")
+
+    for name, status in run_renderers(args.renderers, args.force, args.dry_run).items():
+        print(f"{name}: {status}")
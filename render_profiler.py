@@ -0,0 +1,200 @@
+"""Per-layer render profiling for the static maps.
+
+Tag what each part of a script adds to the figure, then save through the
+profiler:
+
+    profiler = RenderProfiler(fig, enabled='--profile-render' in sys.argv)
+    with profiler.layer('basemap'):
+        ax.add_feature(cfeature.LAND)
+    ...
+    profiler.savefig('map.png', dpi=300)
+    profiler.report()
+
+For every saved format the report gives, per layer, the number of artists,
+renderer draw calls, path vertices actually drawn (after projection, so
+geodesic lines count their interpolated points) and draw time, alongside
+the savefig wall time and output size. Artists added outside any layer
+(titles, legends, axis decorations) are reported as 'other'. When disabled
+``layer()`` does nothing and ``savefig`` is plain ``Figure.savefig``.
+"""
+import contextlib
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+
+from matplotlib.axes import Axes
+from matplotlib.backends.backend_mixed import MixedModeRenderer
+
+UNTAGGED = 'other'
+RENDERER_METHODS = ['draw_path', 'draw_markers', 'draw_path_collection', 'draw_text', 'draw_image']
+
+
+def _top_level_artists(fig):
+    """Figure children other than axes, plus each axes' children."""
+    artists = [a for a in fig.get_children() if not isinstance(a, Axes)]
+    for ax in fig.axes:
+        artists.extend(ax.get_children())
+    return artists
+
+
+def _vertices(method, args):
+    if method == 'draw_path':
+        return len(args[1].vertices)
+    if method == 'draw_markers':
+        return len(args[1].vertices) * len(args[3].vertices)
+    if method == 'draw_path_collection':
+        paths, offsets = args[2], args[4]
+        if not len(paths):
+            return 0
+        per_path = sum(len(p.vertices) for p in paths) / len(paths)
+        return int(per_path * max(len(paths), len(offsets)))
+    return 0
+
+
+class _Pass:
+    """Draw statistics for one renderer, i.e. one draw of the figure."""
+
+    def __init__(self, renderer):
+        self.renderer = renderer
+        self.draw_time = defaultdict(float)
+        self.draw_calls = defaultdict(int)
+        self.vertices = defaultdict(int)
+
+
+class RenderProfiler:
+    def __init__(self, fig, enabled=True):
+        self.fig = fig
+        self.enabled = enabled
+        self.layers = {}
+        self.results = []
+        self._pass = None
+        self._stack = []
+        self._in_renderer = False
+
+    @contextlib.contextmanager
+    def layer(self, name):
+        """Tag every artist added to the figure inside the block with ``name``."""
+        if not self.enabled:
+            yield
+            return
+        before = {id(a) for a in _top_level_artists(self.fig)}
+        try:
+            yield
+        finally:
+            for artist in _top_level_artists(self.fig):
+                if id(artist) not in before and id(artist) not in self.layers:
+                    self.layers[id(artist)] = name
+
+    def _layer_of(self, artist):
+        return self.layers.get(id(artist), UNTAGGED)
+
+    def _wrap_artist(self, artist):
+        original = artist.draw
+        name = self._layer_of(artist)
+
+        def draw(renderer, *args, **kwargs):
+            if self._pass is None or self._pass.renderer is not renderer:
+                self._pass = _Pass(renderer)
+                self._passes.append(self._pass)
+                self._wrap_renderer(renderer)
+            self._stack.append([name, 0.0])
+            start = time.perf_counter()
+            try:
+                return original(renderer, *args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                _, children = self._stack.pop()
+                self._pass.draw_time[name] += elapsed - children
+                if self._stack:
+                    self._stack[-1][1] += elapsed
+
+        artist.draw = draw
+
+    def _wrap_renderer(self, renderer):
+        for method in RENDERER_METHODS:
+            if isinstance(renderer, MixedModeRenderer):
+                # Resolve per call: the target switches while rasterizing
+                def original(*args, _method=method, **kwargs):
+                    return getattr(renderer._renderer, _method)(*args, **kwargs)
+            else:
+                original = getattr(renderer, method, None)
+                if original is None:
+                    continue
+            setattr(renderer, method, self._counting(method, original))
+
+    def _counting(self, method, original):
+        def call(*args, **kwargs):
+            # Default implementations fall back on draw_path; count the outer call only
+            if self._in_renderer or not self._stack:
+                return original(*args, **kwargs)
+            name = self._stack[-1][0]
+            self._pass.draw_calls[name] += 1
+            self._pass.vertices[name] += _vertices(method, args)
+            self._in_renderer = True
+            try:
+                return original(*args, **kwargs)
+            finally:
+                self._in_renderer = False
+        return call
+
+    def savefig(self, path, **kwargs):
+        """``fig.savefig(path)``, recording per-layer draw statistics when enabled."""
+        if not self.enabled:
+            return self.fig.savefig(path, **kwargs)
+        artists = _top_level_artists(self.fig)
+        self._passes = []
+        self._pass = None
+        for artist in artists:
+            self._wrap_artist(artist)
+        start = time.perf_counter()
+        try:
+            self.fig.savefig(path, **kwargs)
+        finally:
+            wall = time.perf_counter() - start
+            for artist in artists:
+                vars(artist).pop('draw', None)
+            for draw_pass in self._passes:
+                for method in RENDERER_METHODS:
+                    vars(draw_pass.renderer).pop(method, None)
+            self._pass = None
+
+        counts = defaultdict(int)
+        for artist in artists:
+            counts[self._layer_of(artist)] += 1
+        # bbox_inches='tight' draws once to measure; the last pass produced the output
+        final = self._passes[-1] if self._passes else _Pass(None)
+        layers = {name: {'artists': counts[name],
+                         'draw_calls': final.draw_calls[name],
+                         'vertices': final.vertices[name],
+                         'draw_s': round(final.draw_time[name], 4)}
+                  for name in sorted(set(counts) | set(final.draw_time))}
+        result = {'path': str(path),
+                  'format': kwargs.get('format') or os.path.splitext(str(path))[1].lstrip('.'),
+                  'savefig_s': round(wall, 4),
+                  'draw_passes': len(self._passes),
+                  # Measuring passes, encoding and writing
+                  'outside_draw_s': round(wall - sum(final.draw_time.values()), 4),
+                  'bytes': os.path.getsize(path) if os.path.exists(str(path)) else None,
+                  'layers': layers}
+        self.results.append(result)
+        return result
+
+    def report(self, json_path=None, file=sys.stdout):
+        """Print one table per saved file and optionally dump the results as JSON."""
+        if not self.enabled:
+            return
+        for result in self.results:
+            size = f"{result['bytes']:,} bytes" if result['bytes'] is not None else 'size unknown'
+            print(f"\n{result['path']} ({result['format']}): savefig {result['savefig_s']:.3f}s, "
+                  f"{size}, {result['draw_passes']} draw pass(es), "
+                  f"{result['outside_draw_s']:.3f}s outside the final draw", file=file)
+            print(f"  {'layer':<24} {'artists':>8} {'calls':>8} {'vertices':>11} {'draw s':>8}", file=file)
+            ordered = sorted(result['layers'].items(), key=lambda item: -item[1]['draw_s'])
+            for name, stats in ordered:
+                print(f"  {name:<24} {stats['artists']:>8} {stats['draw_calls']:>8} "
+                      f"{stats['vertices']:>11,} {stats['draw_s']:>8.3f}", file=file)
+        if json_path:
+            with open(json_path, 'w', encoding='utf-8') as f:
+                json.dump(self.results, f, indent=2)
@@ -3,8 +3,14 @@ import matplotlib.pyplot as plt
 import cartopy.crs as ccrs
 import cartopy.feature as cfeature
 import numpy as np
+import sys
 from matplotlib.patches import Patch, Rectangle
 from matplotlib.lines import Line2D
+from instrumentation import stage
+from render_profiler import RenderProfiler
+from marker_aggregation import (aggregate_links, aggregate_markers, draw_aggregated_links,
+                                draw_aggregated_markers, link_width_pt, marker_radius_pt,
+                                overlap_threshold_px)
 
 # Set up publication-quality settings
 plt.rcParams.update({
@@ -25,29 +31,35 @@ plt.rcParams.update({
 })
 
 # Read data
-df = pd.read_csv('partners_data_with_coords.csv')
+with stage('read csv') as s:
+    df = pd.read_csv('partners_data_with_coords.csv')
+    s.count(len(df), 'rows')
 
 # Create figure with specific dimensions
 fig = plt.figure(figsize=(16, 10))
 
+# Pass --profile-render to report artists, vertices and draw time per layer
+profiler = RenderProfiler(fig, enabled='--profile-render' in sys.argv)
+
 # Create map with focused extent
 ax = plt.axes(projection=ccrs.Robinson(central_longitude=0))
 ax.set_extent([-130, 50, -45, 65], crs=ccrs.PlateCarree())  # Focused on relevant regions
 
 # Enhanced map features
-ax.add_feature(cfeature.LAND, facecolor='#f9f9f9', alpha=1.0)
-ax.add_feature(cfeature.OCEAN, facecolor='#f0f8ff', alpha=1.0)
-ax.add_feature(cfeature.COASTLINE, linewidth=0.6, color='#404040')
-ax.add_feature(cfeature.BORDERS, linestyle=':', color='#808080', alpha=0.3)
-
-# Add refined graticules
-gl = ax.gridlines(draw_labels=False, 
-                  linewidth=0.2, 
-                  color='gray', 
-                  alpha=0.2, 
-                  linestyle=':',
-                  xlocs=np.arange(-180, 181, 30),
-                  ylocs=np.arange(-90, 91, 30))
+with stage('basemap'), profiler.layer('basemap'):
+    ax.add_feature(cfeature.LAND, facecolor='#f9f9f9', alpha=1.0)
+    ax.add_feature(cfeature.OCEAN, facecolor='#f0f8ff', alpha=1.0)
+    ax.add_feature(cfeature.COASTLINE, linewidth=0.6, color='#404040')
+    ax.add_feature(cfeature.BORDERS, linestyle=':', color='#808080', alpha=0.3)
+
+    # Add refined graticules
+    gl = ax.gridlines(draw_labels=False, 
+                      linewidth=0.2, 
+                      color='gray', 
+                      alpha=0.2, 
+                      linestyle=':',
+                      xlocs=np.arange(-180, 181, 30),
+                      ylocs=np.arange(-90, 91, 30))
 
 # Scientific color palette (colorblind-friendly)
 project_colors = {
@@ -60,43 +72,68 @@ project_colors = {
     'HIGH_Horizons': '#555555'  # Gray
 }
 
+# Pass --aggregate to merge partners whose markers would overlap into counted pies
+# and draw one line per pair of merged markers, so dense regions stay readable
+aggregate = '--aggregate' in sys.argv
+max_pt = 9  # largest pie radius, in points
+if aggregate:
+    with stage('aggregate markers') as s:
+        dpi = plt.rcParams['savefig.dpi']
+        markers, marker_of = aggregate_markers(ax, df, list(project_colors),
+                                               threshold_px=overlap_threshold_px(max_pt, dpi), dpi=dpi,
+                                               return_inverse=True)
+        s.count(len(markers), 'markers')
+
 # Draw collaboration lines with improved styling
-for _, source in df[df['Funder'] == 0].iterrows():
-    projects = [col for col in project_colors.keys() if source[col] == 1]
-    for project in projects:
-        partners = df[(df[project] == 1) & (df['Funder'] == 0)]
-        for _, target in partners.iterrows():
-            if source['Institution'] != target['Institution']:
-                ax.plot([source['lon'], target['lon']], 
-                       [source['lat'], target['lat']],
-                       color=project_colors[project],
-                       alpha=0.12,
-                       linewidth=0.5,
-                       transform=ccrs.Geodetic(),
-                       zorder=1)
+with stage('collaboration lines') as s, profiler.layer('collaboration lines'):
+    if aggregate:
+        links = aggregate_links(df, marker_of, list(project_colors))
+        draw_aggregated_links(ax, markers, links, project_colors)
+        s.count(len(links), 'links')
+    else:
+        for _, source in df[df['Funder'] == 0].iterrows():
+            projects = [col for col in project_colors.keys() if source[col] == 1]
+            for project in projects:
+                partners = df[(df[project] == 1) & (df['Funder'] == 0)]
+                for _, target in partners.iterrows():
+                    if source['Institution'] != target['Institution']:
+                        ax.plot([source['lon'], target['lon']], 
+                               [source['lat'], target['lat']],
+                               color=project_colors[project],
+                               alpha=0.12,
+                               linewidth=0.5,
+                               transform=ccrs.Geodetic(),
+                               zorder=1)
+                        s.count(1, 'lines')
 
 # Plot institutions with refined markers
-for _, row in df.iterrows():
-    projects = [proj for proj in project_colors.keys() if row[proj] == 1]
-    if projects:
-        size = len(projects) * 35 + 50  # Adjusted scaling
-        if row['Funder'] == 1:
-            marker = '^'
-            color = '#000000'
-            size = size * 1.2
-        else:
-            marker = 'o'
-            color = project_colors[projects[0]]
+with stage('markers') as s, profiler.layer('markers'):
+    if aggregate:
+        draw_aggregated_markers(ax, markers, project_colors, max_pt=max_pt)
+        s.count(len(markers), 'markers')
+    else:
+        for _, row in df.iterrows():
+            projects = [proj for proj in project_colors.keys() if row[proj] == 1]
+            if projects:
+                size = len(projects) * 35 + 50  # Adjusted scaling
+                if row['Funder'] == 1:
+                    marker = '^'
+                    color = '#000000'
+                    size = size * 1.2
+                else:
+                    marker = 'o'
+                    color = project_colors[projects[0]]
         
-        ax.plot(row['lon'], row['lat'],
-                marker=marker,
-                markersize=np.sqrt(size),
-                color=color,
-                markeredgecolor='white',
-                markeredgewidth=0.8,
-                alpha=0.85,
-                transform=ccrs.PlateCarree(),
-                zorder=5)
+                ax.plot(row['lon'], row['lat'],
+                        marker=marker,
+                        markersize=np.sqrt(size),
+                        color=color,
+                        markeredgecolor='white',
+                        markeredgewidth=0.8,
+                        alpha=0.85,
+                        transform=ccrs.PlateCarree(),
+                        zorder=5)
+                s.count(1, 'markers')
 
 # Create scientific legend
 legend_elements = []
@@ -117,18 +154,19 @@ legend_elements.append(Line2D([0], [0],
                             label='Funding Organization'))
 
 # Add legend with enhanced styling
-leg = ax.legend(handles=legend_elements,
-                loc='lower left',
-                bbox_to_anchor=(0.02, 0.02),
-                title='Research Programs',
-                frameon=True,
-                facecolor='white',
-                edgecolor='#d0d0d0',
-                fontsize=9,
-                title_fontsize=10,
-                framealpha=0.95,
-                borderpad=1,
-                labelspacing=1.2)
+with profiler.layer('legend'):
+    leg = ax.legend(handles=legend_elements,
+                    loc='lower left',
+                    bbox_to_anchor=(0.02, 0.02),
+                    title='Research Programs',
+                    frameon=True,
+                    facecolor='white',
+                    edgecolor='#d0d0d0',
+                    fontsize=9,
+                    title_fontsize=10,
+                    framealpha=0.95,
+                    borderpad=1,
+                    labelspacing=1.2)
 
 # Add scale indicator for node sizes
 def add_size_legend(ax):
@@ -143,14 +181,36 @@ def add_size_legend(ax):
         ax.text(x_base + 0.04, y_base + i*0.05, f'{num} projects',
                 transform=ax.transAxes, va='center', fontsize=8)
 
-add_size_legend(ax)
+# Marker sizes and line widths of the aggregated map
+def add_count_legend(ax, max_pt):
+    counts = [1, 2, 4, 8]
+    handles = [Line2D([0], [0], marker='o', color='w', markerfacecolor='gray', markeredgecolor='white',
+                      alpha=0.6, markersize=2 * float(marker_radius_pt(num, max_pt=max_pt)),
+                      label=f"{num}{'+' if num == counts[-1] else ''} partner{'s' if num > 1 else ''}")
+               for num in counts]
+    handles += [Line2D([0], [0], color='gray', linewidth=float(link_width_pt(num)),
+                       label=f"{num} collaborating pair{'s' if num > 1 else ''}")
+                for num in (1, 10, 100)]
+    count_leg = ax.legend(handles=handles, loc='lower right', bbox_to_anchor=(0.98, 0.02),
+                          title='Merged partners', frameon=True, facecolor='white', edgecolor='#d0d0d0',
+                          fontsize=8, title_fontsize=9, framealpha=0.95, labelspacing=1.0)
+    count_leg.set_zorder(10)  # above the pies
+
+with profiler.layer('legend'):
+    if aggregate:
+        # A second ax.legend() replaces the first unless it is kept as an artist
+        ax.add_artist(leg)
+        add_count_legend(ax, max_pt)
+    else:
+        add_size_legend(ax)
 
 # Add refined title and subtitle
 plt.suptitle('Global Health Research Partnership Network',
              fontsize=16,
              fontweight='bold',
              y=0.95)
-plt.title('Node size proportional to number of project participations',
+plt.title('Nearby partners merged into pies labelled with their count; line width grows with collaborating pairs'
+          if aggregate else 'Node size proportional to number of project participations',
          fontsize=10,
          style='italic',
          pad=20)
@@ -164,16 +224,19 @@ plt.figtext(0.98, 0.02,
             style='italic')
 
 # Save in multiple formats
-plt.savefig('scientific_network_map.pdf',
-            dpi=400,
-            bbox_inches='tight',
-            facecolor='white',
-            edgecolor='none')
-
-plt.savefig('scientific_network_map.png',
-            dpi=400,
-            bbox_inches='tight',
-            facecolor='white',
-            edgecolor='none')
-
+with stage('savefig pdf'):
+    profiler.savefig('scientific_network_map.pdf',
+                     dpi=400,
+                     bbox_inches='tight',
+                     facecolor='white',
+                     edgecolor='none')
+
+with stage('savefig png'):
+    profiler.savefig('scientific_network_map.png',
+                     dpi=400,
+                     bbox_inches='tight',
+                     facecolor='white',
+                     edgecolor='none')
+
+profiler.report('scientific_network_map.render_profile.json')
 plt.close() 
\ No newline at end of file
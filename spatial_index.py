@@ -0,0 +1,176 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from scipy.spatial import cKDTree
+
+from partner_geometry import PROJECTS
+
+MEAN_EARTH_RADIUS_KM = 6371.0088
+# Partners this close count as sharing a site (same campus or building)
+COLOCATION_KM = 1.0
+
+
+def to_unit_vectors(lon, lat):
+    """lon/lat in degrees to (n, 3) points on the unit sphere."""
+    lon = np.radians(np.asarray(lon, dtype=float))
+    lat = np.radians(np.asarray(lat, dtype=float))
+    cos_lat = np.cos(lat)
+    return np.column_stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)])
+
+
+def chord_for_km(distance_km):
+    """Straight-line distance through the unit sphere for a great-circle distance."""
+    angle = np.minimum(np.asarray(distance_km, dtype=float) / MEAN_EARTH_RADIUS_KM, np.pi)
+    return 2 * np.sin(angle / 2)
+
+
+def km_for_chord(chord):
+    return 2 * MEAN_EARTH_RADIUS_KM * np.arcsin(np.clip(np.asarray(chord, dtype=float) / 2, 0, 1))
+
+
+def haversine_km(lon1, lat1, lon2, lat2):
+    """Vectorized great-circle distance in kilometres."""
+    lon1, lat1, lon2, lat2 = (np.radians(np.asarray(v, dtype=float)) for v in (lon1, lat1, lon2, lat2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * MEAN_EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+class PartnerIndex:
+    """Great-circle radius and nearest-neighbour queries over partner locations.
+
+    Points are stored as unit vectors in a KD-tree. Chord length grows
+    monotonically with great-circle distance, so a chord radius selects
+    exactly the points within the haversine radius, without the pole and
+    antimeridian distortion of indexing raw lon/lat. Rows without
+    coordinates are left out; results are row positions in the input.
+    """
+
+    def __init__(self, lon, lat):
+        lon = np.asarray(lon, dtype=float)
+        lat = np.asarray(lat, dtype=float)
+        self.size = len(lon)
+        self.positions = np.flatnonzero(np.isfinite(lon) & np.isfinite(lat))
+        self.tree = cKDTree(to_unit_vectors(lon[self.positions], lat[self.positions]))
+
+    @classmethod
+    def from_frame(cls, df, lon='lon', lat='lat'):
+        return cls(pd.to_numeric(df[lon], errors='coerce'), pd.to_numeric(df[lat], errors='coerce'))
+
+    def within(self, lon, lat, radius_km):
+        """Rows within ``radius_km`` of one point, nearest first, as (positions, distances_km)."""
+        point = to_unit_vectors([lon], [lat])[0]
+        hits = np.asarray(self.tree.query_ball_point(point, chord_for_km(radius_km)), dtype=np.int64)
+        distances = km_for_chord(np.linalg.norm(self.tree.data[hits] - point, axis=1))
+        order = np.argsort(distances, kind='stable')
+        return self.positions[hits[order]], distances[order]
+
+    def nearest(self, lon, lat, k=1):
+        """The ``k`` nearest rows to each query point, as (n, k) distances_km and positions.
+
+        Missing neighbours (fewer than ``k`` points) have distance inf and position -1.
+        """
+        points = to_unit_vectors(np.atleast_1d(lon), np.atleast_1d(lat))
+        k = max(1, int(k))
+        if not len(self.positions):
+            return np.full((len(points), k), np.inf), np.full((len(points), k), -1, dtype=np.int64)
+        chords, hits = self.tree.query(points, k=min(k, max(1, len(self.positions))))
+        chords = np.asarray(chords, dtype=float).reshape(len(points), -1)
+        hits = np.asarray(hits).reshape(len(points), -1)
+        found = hits < len(self.positions)
+        positions = np.where(found, self.positions[np.minimum(hits, len(self.positions) - 1)], -1)
+        distances = np.where(found, km_for_chord(np.where(found, chords, 0)), np.inf)
+        if positions.shape[1] < k:
+            pad = k - positions.shape[1]
+            positions = np.pad(positions, ((0, 0), (0, pad)), constant_values=-1)
+            distances = np.pad(distances, ((0, 0), (0, pad)), constant_values=np.inf)
+        return distances, positions
+
+    def pairs_within(self, radius_km):
+        """All (i, j) row-position pairs, i < j, closer than ``radius_km``."""
+        pairs = self.tree.query_pairs(chord_for_km(radius_km), output_type='ndarray')
+        pairs = self.positions[pairs]
+        return np.sort(pairs, axis=1) if len(pairs) else pairs.reshape(0, 2)
+
+    def colocated(self, radius_km=COLOCATION_KM):
+        """Group label per row: rows joined by any chain of pairs within ``radius_km``.
+
+        Labels are connected components of the within-radius graph (single
+        linkage), numbered in row order. Rows without coordinates get -1.
+        """
+        pairs = self.pairs_within(radius_km)
+        graph = coo_matrix((np.ones(len(pairs), dtype=np.int8), (pairs[:, 0], pairs[:, 1])),
+                           shape=(self.size, self.size))
+        _, components = connected_components(graph, directed=False)
+        # Renumber by first appearance so labels are stable across runs
+        _, first, inverse = np.unique(components, return_index=True, return_inverse=True)
+        labels = np.argsort(np.argsort(first))[inverse]
+        missing = np.ones(self.size, dtype=bool)
+        missing[self.positions] = False
+        labels[missing] = -1
+        return labels
+
+
+def colocated_groups(df, radius_km=COLOCATION_KM, projects=PROJECTS):
+    """Sites shared by more than one partner: members, centre and project mix per group."""
+    labels = PartnerIndex.from_frame(df).colocated(radius_km)
+    valid = labels >= 0
+    sizes = np.bincount(labels[valid], minlength=1)
+    shared = valid & (sizes[np.maximum(labels, 0)] > 1)
+    members = df.loc[shared].assign(site=labels[shared])
+    if members.empty:
+        return pd.DataFrame(columns=['site', 'partners', 'lon', 'lat', 'institutions'])
+    projects = [p for p in projects if p in members.columns]
+    # Centre on the sphere: mean unit vector, converted back to lon/lat
+    xyz = pd.DataFrame(to_unit_vectors(members['lon'], members['lat']), columns=['x', 'y', 'z'],
+                       index=members.index).groupby(members['site']).mean()
+    groups = members.groupby('site').agg(partners=('Institution', 'size'),
+                                         institutions=('Institution', lambda names: '; '.join(names)))
+    groups['lon'] = np.degrees(np.arctan2(xyz['y'], xyz['x']))
+    groups['lat'] = np.degrees(np.arctan2(xyz['z'], np.hypot(xyz['x'], xyz['y'])))
+    if projects:
+        groups = groups.join(members.groupby('site')[projects].sum())
+    return groups.reset_index()[['site', 'partners', 'lon', 'lat'] + projects + ['institutions']]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query partners by distance and find shared sites")
+    parser.add_argument('--csv', default='partners_cleaned_with_short_names.csv')
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--near', metavar='LON,LAT', help="query point as lon,lat")
+    group.add_argument('--institution', help="query around this institution")
+    group.add_argument('--colocated', type=float, nargs='?', const=COLOCATION_KM, metavar='KM',
+                       help=f"list groups of partners within KM of each other (default {COLOCATION_KM})")
+    parser.add_argument('--radius', type=float, help="partners within this many km")
+    parser.add_argument('-k', type=int, default=5, help="nearest partners to list when no radius is given")
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.csv)
+    index = PartnerIndex.from_frame(df)
+    if args.colocated is not None:
+        groups = colocated_groups(df, args.colocated)
+        print(f"{len(groups)} shared sites ({int(groups['partners'].sum()) if len(groups) else 0} partners) "
+              f"within {args.colocated:g} km")
+        for _, group_row in groups.iterrows():
+            print(f"- ({group_row['lon']:.4f}, {group_row['lat']:.4f}) {group_row['partners']} partners: "
+                  f"{group_row['institutions']}")
+    else:
+        if args.near:
+            lon, lat = (float(v) for v in args.near.split(','))
+        else:
+            match = df[df['Institution'].str.contains(args.institution, case=False, regex=False, na=False)]
+            if match.empty:
+                parser.error(f"no institution matching {args.institution!r}")
+            lon, lat = float(match.iloc[0]['lon']), float(match.iloc[0]['lat'])
+            print(f"Around {match.iloc[0]['Institution']} ({lon:.4f}, {lat:.4f})")
+        if args.radius is not None:
+            positions, distances = index.within(lon, lat, args.radius)
+        else:
+            distances, positions = index.nearest(lon, lat, args.k)
+            keep = positions[0] >= 0
+            positions, distances = positions[0][keep], distances[0][keep]
+        for position, distance in zip(positions, distances):
+            row = df.iloc[position]
+            print(f"{distance:9.1f} km  {row['Institution']} ({row['City']}, {row['Country']})")
@@ -0,0 +1,177 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from partner_geometry import PROJECTS
+from partner_table import TEXT_COLUMNS, read_table
+
+TEMPLATE_TABLE = 'partners_cleaned_with_short_names.csv'
+
+# (name prefix, name suffix, short-name code, named after the country rather than the city)
+PARTNER_KINDS = [
+    ('University of ', '', 'U', False),
+    ('', ' Institute of Public Health', 'IPH', False),
+    ('', ' Climate and Health Centre', 'CHC', False),
+    ('', ' Academic Hospital', 'AH', False),
+    ('National Health Research Institute of ', '', 'NHRI', True),
+    ('Ministry of Health, ', '', 'MoH', True),
+]
+FUNDER_KINDS = [
+    ('', ' Research Council', 'RC', True),
+    ('', ' Health Foundation', 'HF', True),
+]
+
+# Share of partners placed well away from their city centre (regional campuses, field sites)
+SPREAD_FRACTION = 0.1
+CITY_SIGMA_DEG = 0.03
+SPREAD_SIGMA_DEG = 0.4
+
+
+def _template(like):
+    header, rows = read_table(like)
+    df = pd.DataFrame(rows, columns=header)
+    flags = [col for col in header if col not in TEXT_COLUMNS]
+    df[flags] = df[flags].apply(pd.to_numeric, errors='coerce').fillna(0)
+    df['lon'] = pd.to_numeric(df['lon'], errors='coerce')
+    df['lat'] = pd.to_numeric(df['lat'], errors='coerce')
+    return header, df.dropna(subset=['lon', 'lat'])
+
+
+def _names(rng, city_idx, cities, funder):
+    """Vectorized institution and short names, made unique with a serial per (kind, place).
+
+    Names are built once per distinct (kind, place) and gathered by index,
+    so only the serial suffix is formatted per row.
+    """
+    kinds = PARTNER_KINDS + FUNDER_KINDS
+    n_partner_kinds = len(PARTNER_KINDS)
+    kind = np.where(funder, n_partner_kinds + rng.integers(0, len(FUNDER_KINDS), len(city_idx)),
+                    rng.integers(0, n_partner_kinds, len(city_idx)))
+    combo, inverse = np.unique(kind * len(cities) + city_idx, return_inverse=True)
+    labels, codes = [], []
+    for key in combo:
+        prefix, suffix, code, by_country = kinds[key // len(cities)]
+        place = cities[key % len(cities)][1 if by_country else 0]
+        labels.append(prefix + place + suffix)
+        codes.append(f"{code} {''.join(c for c in place if c.isalpha())[:3].upper()}")
+
+    # Country-named kinds (and 3-letter codes) repeat across cities, so number per distinct string
+    return _numbered(np.array(labels, dtype=object), inverse), _numbered(np.array(codes, dtype=object), inverse)
+
+
+def _numbered(strings, index):
+    """``strings[index]`` with ' 2', ' 3', ... appended to repeats, in row order."""
+    ids = np.unique(strings, return_inverse=True)[1][index]
+    order = np.argsort(ids, kind='stable')
+    starts = np.r_[0, np.flatnonzero(np.diff(ids[order])) + 1]
+    serial = np.empty(len(ids), dtype=np.int64)
+    serial[order] = np.arange(len(ids)) - np.repeat(starts, np.diff(np.r_[starts, len(ids)]))
+    suffix = pd.Series(serial + 1).astype(str).radd(' ').where(serial > 0, '')
+    return (strings[index] + suffix).to_numpy()
+
+
+def generate_partners(n, seed=0, funder_fraction=None, like=TEMPLATE_TABLE):
+    """A seeded synthetic partner table with the schema and statistics of ``like``.
+
+    Partners sit around the template's cities (weighted by how many real
+    partners each city has), mostly within a few kilometres and sometimes
+    further out. Each non-funder joins as many projects as real partners do,
+    drawn from its city's project mix so regional skew and overlap carry over.
+    Other flag columns follow the template's rates.
+    """
+    rng = np.random.default_rng(seed)
+    header, template = _template(like)
+    projects = [p for p in PROJECTS if p in header]
+    if funder_fraction is None:
+        funder_fraction = template['Funder'].mean() if 'Funder' in template else 0.1
+
+    # Cities, with smoothing so rare cities still appear
+    cities = template.groupby(['City', 'Country']).agg(lon=('lon', 'mean'), lat=('lat', 'mean'),
+                                                       count=('lon', 'size'))
+    cities = cities.reset_index()
+    pick = rng.choice(len(cities), n, p=(cities['count'] + 0.5) / (cities['count'] + 0.5).sum())
+    city = cities['City'].to_numpy()[pick]
+    country = cities['Country'].to_numpy()[pick]
+    sigma = np.where(rng.random(n) < SPREAD_FRACTION, SPREAD_SIGMA_DEG, CITY_SIGMA_DEG)
+    lon = np.clip(cities['lon'].to_numpy()[pick] + rng.normal(0, 1, n) * sigma, -180, 180)
+    lat = np.clip(cities['lat'].to_numpy()[pick] + rng.normal(0, 1, n) * sigma, -85, 85)
+
+    funder = rng.random(n) < funder_fraction
+    out = {}
+
+    # Project counts follow the real distribution; which projects follow the city's mix
+    members = template[template['Funder'] == 0] if 'Funder' in template else template
+    per_partner = members[projects].sum(axis=1).astype(int).to_numpy()
+    k = rng.choice(per_partner, n)
+    k = np.where(funder, 0, np.clip(k, 1, len(projects)))
+    global_rate = members[projects].mean().to_numpy() + 1e-3
+    city_rate = template.assign(_city=template['City']).groupby('_city')[projects].sum()
+    city_count = template.groupby('City').size()
+    smoothed = ((city_rate.to_numpy() + 2 * global_rate) /
+                (city_count.to_numpy()[:, None] + 2))
+    rates = pd.DataFrame(smoothed, index=city_rate.index).reindex(city).to_numpy()
+    # Gumbel top-k: k weighted draws without replacement per row
+    keys = np.log(rates) + rng.gumbel(size=rates.shape)
+    rank = np.argsort(np.argsort(-keys, axis=1), axis=1)
+    flags = rank < k[:, None]
+    for j, project in enumerate(projects):
+        out[project] = flags[:, j].astype(np.int8)
+
+    out['Institution'], out['Short_Name'] = _names(
+        rng, pick, list(zip(cities['City'], cities['Country'])), funder)
+    out['City'] = city
+    out['Country'] = country
+    out['lon'] = lon.round(6)
+    out['lat'] = lat.round(6)
+    out['Funder'] = funder.astype(np.int8)
+    for col in header:
+        if col not in out and col not in TEXT_COLUMNS:
+            out[col] = (rng.random(n) < template[col].mean()).astype(np.int8)
+    columns = header + [c for c in ('Short_Name',) if c not in header]
+    return pd.DataFrame({col: out[col] for col in columns if col in out})
+
+
+def write_partners(df, path):
+    """Write by extension: .csv (optionally .gz), .parquet/.feather (pyarrow) or .pkl."""
+    if path.endswith(('.csv', '.csv.gz')):
+        df.to_csv(path, index=False)
+    elif path.endswith('.parquet'):
+        df.to_parquet(path, index=False)
+    elif path.endswith('.feather'):
+        df.to_feather(path)
+    elif path.endswith('.pkl'):
+        df.to_pickle(path)
+    else:
+        raise ValueError(f"unsupported output format: {path}")
+
+
+def read_partners(path):
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path)
+    if path.endswith('.feather'):
+        return pd.read_feather(path)
+    if path.endswith('.pkl'):
+        return pd.read_pickle(path)
+    return pd.read_csv(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic partner table for scale testing")
+    parser.add_argument('rows', type=int)
+    parser.add_argument('-o', '--out', nargs='+', default=['synthetic_partners.csv'],
+                        help="output files; format from extension (.csv, .csv.gz, .parquet, .feather, .pkl)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--funders', type=float, default=None, help="funder fraction (default: as in the template)")
+    parser.add_argument('--like', default=TEMPLATE_TABLE, help="partner table whose schema and rates to copy")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    df = generate_partners(args.rows, args.seed, args.funders, args.like)
+    print(f"Generated {len(df):,} partners in {time.perf_counter() - start:.2f}s")
+    for path in args.out:
+        start = time.perf_counter()
+        write_partners(df, path)
+        print(f"Wrote {path} ({os.path.getsize(path):,} bytes) in {time.perf_counter() - start:.2f}s")
@@ -0,0 +1,299 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection
+
+from partner_geometry import (EARTH_RADIUS_M, collaboration_pairs,
+                              great_circle_points, split_antimeridian, to_web_mercator)
+
+TILE_SIZE = 256
+ORIGIN_SHIFT = np.pi * EARTH_RADIUS_M  # Half the width of the EPSG:3857 square
+
+# Same palette and marker scaling as enhanced_publication_map.py
+project_colors = {
+    'CHAMNHA': '#1f77b4',
+    'HEAT': '#d62728',
+    'ENBEL': '#2ca02c',
+    'GHAP': '#9467bd',
+    'HAPI': '#ff7f0e',
+    'BioHEAT': '#17becf',
+    'HIGH_Horizons': '#7f7f7f'
+}
+
+STYLE = {
+    'arc_alpha': 0.25,
+    'arc_linewidth': 0.6,
+    'marker_alpha': 0.8,
+    'marker_edgewidth': 1.0,
+    'dpi': 72,
+}
+
+VIEWER_HTML = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Partner network tiles</title>
+<link rel="stylesheet" href="https://unpkg.com/leaflet@1.9.4/dist/leaflet.css">
+<script src="https://unpkg.com/leaflet@1.9.4/dist/leaflet.js"></script>
+<style>html, body, #map {{ height: 100%; margin: 0; }}</style>
+</head>
+<body>
+<div id="map"></div>
+<script>
+var map = L.map('map').setView([0, 20], 3);
+L.tileLayer('https://{{s}}.basemaps.cartocdn.com/light_all/{{z}}/{{x}}/{{y}}.png', {{
+    attribution: '&copy; OpenStreetMap &copy; CARTO'
+}}).addTo(map);
+L.tileLayer('{{z}}/{{x}}/{{y}}.png', {{minZoom: {min_zoom}, maxNativeZoom: {max_zoom}, errorTileUrl: ''}}).addTo(map);
+</script>
+</body>
+</html>
+"""
+
+
+def tile_bounds(z, x, y):
+    """EPSG:3857 bounds (xmin, ymin, xmax, ymax) of XYZ tile (z, x, y)."""
+    span = 2 * ORIGIN_SHIFT / (1 << z)
+    xmin = -ORIGIN_SHIFT + x * span
+    ymax = ORIGIN_SHIFT - y * span
+    return xmin, ymax - span, xmin + span, ymax
+
+
+def _tile_coords(mx, my, z):
+    n = 1 << z
+    tx = np.floor((np.asarray(mx) + ORIGIN_SHIFT) / (2 * ORIGIN_SHIFT) * n).astype(int)
+    ty = np.floor((ORIGIN_SHIFT - np.asarray(my)) / (2 * ORIGIN_SHIFT) * n).astype(int)
+    return np.clip(tx, 0, n - 1), np.clip(ty, 0, n - 1)
+
+
+def build_layers(df, colors=project_colors, arc_points=64):
+    """Project markers and deduplicated collaboration arcs to Web Mercator once."""
+    df = df.dropna(subset=['lon', 'lat']).reset_index(drop=True)
+    projects = [proj for proj in colors if proj in df.columns]
+    flags = df[projects].fillna(0).to_numpy() == 1
+    has_project = flags.any(axis=1)
+    funder = (df['Funder'].fillna(0).to_numpy() == 1) if 'Funder' in df.columns else np.zeros(len(df), bool)
+
+    mx, my = to_web_mercator(df['lon'].to_numpy(), df['lat'].to_numpy())
+    sizes = flags.sum(axis=1) * 40 + 60
+    first = np.argmax(flags, axis=1)
+    markers = {
+        'x': mx[has_project],
+        'y': my[has_project],
+        'size': np.where(funder, sizes * 1.3, sizes)[has_project],
+        'color': np.where(funder, '#000000', np.array([colors[projects[k]] for k in first]))[has_project],
+        'funder': funder[has_project],
+    }
+
+    arcs = []
+    lon = df['lon'].to_numpy(dtype=float)
+    lat = df['lat'].to_numpy(dtype=float)
+    for project, pairs in collaboration_pairs(df, projects).items():
+        if not len(pairs):
+            continue
+        lines = great_circle_points(lon[pairs[:, 0]], lat[pairs[:, 0]],
+                                    lon[pairs[:, 1]], lat[pairs[:, 1]], n=arc_points)
+        for line in lines:
+            for part in split_antimeridian(line):
+                x, y = to_web_mercator(part[:, 0], part[:, 1])
+                arcs.append((np.column_stack([x, y]), colors[project]))
+    return markers, arcs
+
+
+def plan_tiles(markers, arcs, z, marker_buffer_px=12):
+    """Map each non-empty tile at zoom ``z`` to the markers and arcs that touch it."""
+    resolution = 2 * ORIGIN_SHIFT / (TILE_SIZE * (1 << z))
+    buffer = marker_buffer_px * resolution
+    plan = {}
+
+    x0, y0 = _tile_coords(markers['x'] - buffer, markers['y'] + buffer, z)
+    x1, y1 = _tile_coords(markers['x'] + buffer, markers['y'] - buffer, z)
+    for k in range(len(markers['x'])):
+        for tx in range(x0[k], x1[k] + 1):
+            for ty in range(y0[k], y1[k] + 1):
+                plan.setdefault((tx, ty), ([], []))[0].append(k)
+
+    for k, (line, _) in enumerate(arcs):
+        tx, ty = _tile_coords(line[:, 0], line[:, 1], z)
+        touched = set(zip(tx.tolist(), ty.tolist()))
+        # Segments that cross tile boundaries can pass through tiles with no vertex
+        for s in np.flatnonzero((tx[1:] != tx[:-1]) | (ty[1:] != ty[:-1])):
+            for cx in range(min(tx[s], tx[s + 1]), max(tx[s], tx[s + 1]) + 1):
+                for cy in range(min(ty[s], ty[s + 1]), max(ty[s], ty[s + 1]) + 1):
+                    touched.add((cx, cy))
+        for tile in touched:
+            plan.setdefault(tile, ([], []))[1].append(k)
+    return plan
+
+
+def _tile_payload(z, x, y, marker_idx, arc_idx, markers, arcs, pad=4):
+    """Tile-local pixel geometry; identical payloads render identical tiles.
+
+    Arcs are cut down to the runs of segments that actually cross the tile,
+    so low-zoom tiles do not carry every vertex of every arc.
+    """
+    xmin, ymin, xmax, ymax = tile_bounds(z, x, y)
+    scale = TILE_SIZE / (xmax - xmin)
+    m = np.asarray(marker_idx, dtype=int)
+    payload = {
+        'marker_xy': np.round(np.column_stack([(markers['x'][m] - xmin) * scale,
+                                               (ymax - markers['y'][m]) * scale]), 1).astype(np.float32),
+        'marker_size': markers['size'][m].astype(np.float32),
+        'marker_color': markers['color'][m].tolist(),
+        'marker_funder': markers['funder'][m],
+        'arcs': [],
+    }
+    for k in arc_idx:
+        line, color = arcs[k]
+        px = (line[:, 0] - xmin) * scale
+        py = (ymax - line[:, 1]) * scale
+        # Keep segments whose bounding box overlaps the (padded) tile
+        keep = ((np.maximum(px[:-1], px[1:]) >= -pad) & (np.minimum(px[:-1], px[1:]) <= TILE_SIZE + pad) &
+                (np.maximum(py[:-1], py[1:]) >= -pad) & (np.minimum(py[:-1], py[1:]) <= TILE_SIZE + pad))
+        segments = np.flatnonzero(keep)
+        if not len(segments):
+            continue
+        for run in np.split(segments, np.flatnonzero(np.diff(segments) > 1) + 1):
+            vertices = np.arange(run[0], run[-1] + 2)
+            payload['arcs'].append((np.round(np.column_stack([px[vertices], py[vertices]]), 1)
+                                    .astype(np.float32), color))
+    return payload
+
+
+def _payload_digest(payload):
+    digest = hashlib.sha1(json.dumps(STYLE, sort_keys=True).encode('utf-8'))
+    for key in ('marker_xy', 'marker_size', 'marker_funder'):
+        digest.update(np.ascontiguousarray(payload[key]).tobytes())
+    digest.update('|'.join(payload['marker_color']).encode('utf-8'))
+    for line, color in payload['arcs']:
+        digest.update(color.encode('utf-8'))
+        digest.update(line.tobytes())
+    return digest.hexdigest()
+
+
+def render_tile(payload, path):
+    """Render one transparent tile from its pixel-space payload."""
+    dpi = STYLE['dpi']
+    fig = Figure(figsize=(TILE_SIZE / dpi, TILE_SIZE / dpi), dpi=dpi)
+    FigureCanvasAgg(fig)
+    fig.patch.set_alpha(0)
+    ax = fig.add_axes([0, 0, 1, 1])
+    ax.set_xlim(0, TILE_SIZE)
+    ax.set_ylim(TILE_SIZE, 0)
+    ax.axis('off')
+
+    if payload['arcs']:
+        ax.add_collection(LineCollection([line for line, _ in payload['arcs']],
+                                         colors=[color for _, color in payload['arcs']],
+                                         linewidths=STYLE['arc_linewidth'],
+                                         alpha=STYLE['arc_alpha'],
+                                         zorder=1))
+    xy = payload['marker_xy']
+    colors = np.asarray(payload['marker_color'])
+    funder = np.asarray(payload['marker_funder'], dtype=bool)
+    for marker, mask in (('o', ~funder), ('^', funder)):
+        if mask.any():
+            ax.scatter(xy[mask, 0], xy[mask, 1],
+                       s=payload['marker_size'][mask],
+                       c=colors[mask],
+                       marker=marker,
+                       edgecolors='white',
+                       linewidths=STYLE['marker_edgewidth'],
+                       alpha=STYLE['marker_alpha'],
+                       zorder=5)
+    fig.savefig(path, format='png', dpi=dpi, transparent=True)
+
+
+def _render_cached(job):
+    payload, cached = job
+    os.makedirs(os.path.dirname(cached), exist_ok=True)
+    tmp = f"{cached}.{os.getpid()}.tmp"
+    render_tile(payload, tmp)
+    os.replace(tmp, cached)
+
+
+def _remove_stale_tiles(out_dir, keep):
+    """Delete z/x/y.png tiles under ``out_dir`` not in ``keep`` and prune emptied directories."""
+    removed = 0
+    for z in os.listdir(out_dir):
+        z_dir = os.path.join(out_dir, z)
+        if not z.isdigit() or not os.path.isdir(z_dir):
+            continue
+        for root, dirs, files in os.walk(z_dir, topdown=False):
+            for name in files:
+                path = os.path.join(root, name)
+                if name.endswith('.png') and path not in keep:
+                    os.remove(path)
+                    removed += 1
+            if not os.listdir(root):
+                os.rmdir(root)
+    return removed
+
+
+def export_tiles(df, out_dir='tiles', min_zoom=0, max_zoom=6, workers=None,
+                 cache_dir=None, colors=project_colors):
+    """Write the partner and collaboration layers as an XYZ tile pyramid.
+
+    Only tiles containing a marker or arc are written. Rendered tiles are
+    cached by a hash of their content, and only cache misses are sent to the
+    worker processes, so unchanged tiles are never redrawn. Tiles left in
+    ``out_dir`` by earlier runs that are not part of this pyramid (higher
+    zooms, removed partners) are deleted.
+    """
+    cache_dir = cache_dir or os.path.join(out_dir, '.cache')
+    markers, arcs = build_layers(df, colors)
+
+    tiles = []
+    misses = {}
+    for z in range(min_zoom, max_zoom + 1):
+        for (x, y), (marker_idx, arc_idx) in sorted(plan_tiles(markers, arcs, z).items()):
+            payload = _tile_payload(z, x, y, marker_idx, arc_idx, markers, arcs)
+            if not len(payload['marker_xy']) and not payload['arcs']:
+                continue
+            digest = _payload_digest(payload)
+            cached = os.path.join(cache_dir, digest[:2], digest + '.png')
+            if not os.path.exists(cached):
+                misses[cached] = payload
+            tiles.append((z, x, y, cached))
+
+    if misses:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(_render_cached, [(payload, cached) for cached, payload in misses.items()],
+                          chunksize=8))
+
+    targets = set()
+    for z, x, y, cached in tiles:
+        target = os.path.join(out_dir, str(z), str(x), f"{y}.png")
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copyfile(cached, target)
+        targets.add(target)
+    removed = _remove_stale_tiles(out_dir, targets)
+
+    with open(os.path.join(out_dir, 'index.html'), 'w', encoding='utf-8') as f:
+        f.write(VIEWER_HTML.format(min_zoom=min_zoom, max_zoom=max_zoom))
+
+    return {'tiles': len(tiles), 'rendered': len(misses), 'cached': len(tiles) - len(misses),
+            'removed': removed}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export partner map layers as XYZ tiles")
+    parser.add_argument('--csv', default='partners_data_with_coords.csv')
+    parser.add_argument('--out', default='tiles')
+    parser.add_argument('--min-zoom', type=int, default=0)
+    parser.add_argument('--max-zoom', type=int, default=6)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.csv)
+    stats = export_tiles(df, args.out, args.min_zoom, args.max_zoom, args.workers)
+    print(f"Wrote {stats['tiles']} tiles to {args.out} "
+          f"({stats['rendered']} rendered, {stats['cached']} from cache, {stats['removed']} stale removed)")
@@ -0,0 +1,316 @@
+"""Re-render map previews whenever the partner tables or map scripts change.
+
+    python watch_maps.py                          # every renderer in render_manifest.RENDERERS
+    python watch_maps.py scientific_publication_map facet_maps --dpi 60
+
+A single warm worker process imports pandas, matplotlib, cartopy and the
+map modules once, then runs the registered renderer scripts in a preview
+directory. ``pd.read_csv`` of a renderer's data file is served from an
+in-memory snapshot, and an edit to the file is applied to that snapshot as
+a line diff, so only the changed rows are parsed again. A renderer runs
+again only when its style files change or the columns and rows it reads
+differ. Static figures are saved as PNG at preview dpi (other formats are
+skipped), and Natural Earth geometries stay in cartopy's cache between
+renders.
+"""
+import argparse
+import contextlib
+import difflib
+import hashlib
+import importlib
+import io
+import json
+import os
+import runpy
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from render_manifest import RENDERERS
+
+PREVIEW_DIR = 'previews'
+PREVIEW_DPI = 72
+PREVIEW_FORMATS = ('png',)
+WARM_MODULES = ['numpy', 'pandas', 'matplotlib.pyplot', 'cartopy.crs', 'cartopy.feature',
+                'networkx', 'folium']
+
+# Worker-side state, set up once per process by init_worker
+_worker = {}
+
+
+class CsvSnapshot:
+    """A CSV parsed once and kept current by re-parsing only the lines that changed."""
+
+    def __init__(self, path, read_csv, kwargs):
+        self.path = path
+        self.kwargs = kwargs
+        self._read_csv = read_csv
+        self.lines = []
+        self.df = None
+        self.update()
+
+    def _parse(self, header, lines):
+        return self._read_csv(io.StringIO(header + ''.join(lines)), **self.kwargs)
+
+    def _reload(self, lines):
+        self.lines = lines
+        self.df = self._read_csv(self.path, **self.kwargs)
+        return len(self.df)
+
+    def update(self):
+        """Apply the file's current contents; returns the number of rows re-parsed.
+
+        The line diff only holds while every CSV line is one row; quoted
+        newlines, blank lines or a slice that fails to parse on its own fall
+        back to reading the whole file.
+        """
+        import pandas as pd
+        with open(self.path, encoding=self.kwargs.get('encoding', 'utf-8'), newline='') as f:
+            lines = f.read().splitlines(keepends=True)
+        if lines and not lines[-1].endswith('\n'):
+            lines[-1] += '\n'
+        if (self.df is None or not lines or lines[:1] != self.lines[:1]
+                or len(self.df) != len(self.lines) - 1):
+            return self._reload(lines)
+
+        header, old, new = lines[0], self.lines[1:], lines[1:]
+        pieces, parsed = [], 0
+        opcodes = difflib.SequenceMatcher(None, old, new, autojunk=False).get_opcodes()
+        if all(op == 'equal' for op, *_ in opcodes):
+            self.lines = lines
+            return 0
+        try:
+            for op, i1, i2, j1, j2 in opcodes:
+                if op == 'equal':
+                    pieces.append(self.df.iloc[i1:i2])
+                elif op in ('replace', 'insert'):
+                    pieces.append(self._parse(header, new[j1:j2]))
+                    parsed += j2 - j1
+        except ValueError:
+            return self._reload(lines)
+        df = pd.concat(pieces, ignore_index=True) if pieces else self.df.iloc[0:0]
+        if len(df) != len(new):
+            return self._reload(lines)
+        self.df = df
+        self.lines = lines
+        return parsed
+
+
+def _snapshot_read_csv(read_csv):
+    def read(path, *args, **kwargs):
+        real = os.path.realpath(path) if isinstance(path, (str, os.PathLike)) else None
+        if args or real not in _worker['data_files']:
+            return read_csv(path, *args, **kwargs)
+        key = (real, json.dumps(kwargs, sort_keys=True, default=str))
+        if key not in _worker['snapshots']:
+            _worker['snapshots'][key] = CsvSnapshot(real, read_csv, kwargs)
+        # Scripts add columns to what they read, so each gets its own copy
+        return _worker['snapshots'][key].df.copy()
+    return read
+
+
+def _preview_savefig(savefig, dpi):
+    def save(fig, fname, *args, **kwargs):
+        fmt = kwargs.get('format') or os.path.splitext(str(fname))[1].lstrip('.').lower()
+        if fmt not in PREVIEW_FORMATS:
+            return None
+        kwargs['dpi'] = dpi
+        return savefig(fig, fname, *args, **kwargs)
+    return save
+
+
+def init_worker(source_dir, preview_dir, dpi):
+    """Import the heavy libraries and patch reads and saves for preview rendering."""
+    import matplotlib
+    matplotlib.use('Agg')
+    for name in WARM_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
+    import pandas as pd
+    from matplotlib.figure import Figure
+
+    sys.path.insert(0, source_dir)
+    os.makedirs(preview_dir, exist_ok=True)
+    os.chdir(preview_dir)
+    _worker.update(source_dir=source_dir, snapshots={}, signatures={},
+                   data_files={os.path.realpath(os.path.join(source_dir, spec['data']))
+                               for spec in RENDERERS.values()})
+    # Scripts read their inputs by relative path
+    for spec in RENDERERS.values():
+        if not os.path.lexists(spec['data']):
+            os.symlink(os.path.join(source_dir, spec['data']), spec['data'])
+    pd.read_csv = _snapshot_read_csv(pd.read_csv)
+    Figure.savefig = _preview_savefig(Figure.savefig, dpi)
+
+
+def data_signature(name):
+    """Hash of exactly the columns and rows a renderer reads, from the snapshot."""
+    import pandas as pd
+    spec = RENDERERS[name]
+    df = pd.read_csv(spec['data'])
+    if spec.get('rows'):
+        column, value = spec['rows']
+        df = df[df[column] == value] if column in df.columns else df.iloc[0:0]
+    df = df[[col for col in spec['columns'] if col in df.columns]]
+    hashed = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    return hashlib.sha256(json.dumps(list(df.columns)).encode('utf-8') + hashed.tobytes()).hexdigest()
+
+
+def render(name):
+    """Run one renderer script as ``__main__`` in the preview directory."""
+    import matplotlib.pyplot as plt
+    argv = sys.argv
+    sys.argv = [f'{name}.py']
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            runpy.run_path(os.path.join(_worker['source_dir'], f'{name}.py'), run_name='__main__')
+        status = 'rendered'
+    except Exception:
+        status = 'failed: ' + traceback.format_exc().strip().splitlines()[-1]
+    finally:
+        sys.argv = argv
+        plt.close('all')
+    return status, time.perf_counter() - start
+
+
+def local_modules():
+    """Source files of the repo modules loaded in this worker, direct or transitive imports alike."""
+    root = os.path.realpath(_worker['source_dir']) + os.sep
+    paths = set()
+    for module in list(sys.modules.values()):
+        path = getattr(module, '__file__', None)
+        if path and os.path.realpath(path).startswith(root):
+            paths.add(os.path.realpath(path))
+    return sorted(paths)
+
+
+def refresh(names, changed=None):
+    """Update snapshots for ``changed`` files and re-render the affected renderers.
+
+    With ``changed=None`` everything in ``names`` is rendered. A loaded repo
+    module that no renderer lists as a style file re-renders every renderer.
+    """
+    changed = {os.path.realpath(path) for path in changed or ()}
+    listed = {os.path.realpath(os.path.join(_worker['source_dir'], p))
+              for name in names for p in RENDERERS[name]['style']}
+    unlisted = (changed & set(local_modules())) - listed
+    for key, snapshot in list(_worker['snapshots'].items()):
+        if key[0] in changed:
+            try:
+                snapshot.update()
+            except Exception:
+                # Re-read from scratch once the file parses again
+                del _worker['snapshots'][key]
+
+    # Helper modules the scripts import are reloaded when their source changes
+    for module in list(sys.modules.values()):
+        path = getattr(module, '__file__', None)
+        if path and os.path.realpath(path) in changed and module.__name__ != '__main__':
+            try:
+                importlib.reload(module)
+            except Exception as e:
+                print(f"Could not reload {module.__name__}: {e}", file=sys.stderr)
+
+    results = {}
+    for name in names:
+        spec = RENDERERS[name]
+        styles = {os.path.realpath(os.path.join(_worker['source_dir'], p)) for p in spec['style']}
+        data = os.path.realpath(os.path.join(_worker['source_dir'], spec['data']))
+        try:
+            signature = data_signature(name)
+        except Exception:
+            signature = None
+        data_changed = signature is None or signature != _worker['signatures'].get(name)
+        if changed and not unlisted and not styles & changed and not (data in changed and data_changed):
+            continue
+        _worker['signatures'][name] = signature
+        results[name] = render(name)
+    return results
+
+
+def watched_files(names, source_dir):
+    """Data and style files of ``names``; ``watch`` adds the modules the renders import."""
+    paths = set()
+    for name in names:
+        spec = RENDERERS[name]
+        paths.add(os.path.realpath(os.path.join(source_dir, spec['data'])))
+        paths.update(os.path.realpath(os.path.join(source_dir, p)) for p in spec['style'])
+    return sorted(paths)
+
+
+def _stamp(path):
+    try:
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+    except OSError:
+        return None
+
+
+def watch(names, source_dir='.', preview_dir=PREVIEW_DIR, dpi=PREVIEW_DPI, interval=0.25):
+    source_dir = os.path.abspath(source_dir)
+    preview_dir = os.path.abspath(preview_dir)
+    paths = watched_files(names, source_dir)
+
+    def start_worker():
+        return ProcessPoolExecutor(max_workers=1, initializer=init_worker,
+                                   initargs=(source_dir, preview_dir, dpi))
+
+    def report(results):
+        for name, (status, seconds) in results.items():
+            print(f"{time.strftime('%H:%M:%S')} {name}: {status} ({seconds:.2f}s)", flush=True)
+
+    def watch_imports():
+        # Helper modules pulled in at run time, beyond what the manifest lists
+        for path in pool.submit(local_modules).result():
+            if path not in stamps:
+                paths.append(path)
+                stamps[path] = _stamp(path)
+
+    pool = start_worker()
+    stamps = {path: _stamp(path) for path in paths}
+    print(f"Rendering {len(names)} previews into {preview_dir} at {dpi} dpi")
+    report(pool.submit(refresh, names).result())
+    watch_imports()
+    print(f"Watching {len(paths)} files", flush=True)
+    try:
+        while True:
+            time.sleep(interval)
+            current = {path: _stamp(path) for path in paths}
+            changed = [path for path in paths if current[path] != stamps[path]]
+            if not changed:
+                continue
+            stamps = current
+            print(f"{time.strftime('%H:%M:%S')} changed: {', '.join(os.path.basename(p) for p in changed)}",
+                  flush=True)
+            try:
+                report(pool.submit(refresh, names, changed).result())
+                watch_imports()
+            except BrokenProcessPool:
+                print("Render worker died; restarting it", flush=True)
+                pool = start_worker()
+                report(pool.submit(refresh, names).result())
+            except Exception as e:
+                print(f"Refresh failed: {e}", flush=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Keep map previews current while editing data or scripts")
+    parser.add_argument('renderers', nargs='*', help="renderers to preview (default: all)")
+    parser.add_argument('--out', default=PREVIEW_DIR, help="preview directory")
+    parser.add_argument('--dpi', type=int, default=PREVIEW_DPI)
+    parser.add_argument('--interval', type=float, default=0.25, help="seconds between file checks")
+    args = parser.parse_args()
+    unknown = sorted(set(args.renderers) - set(RENDERERS))
+    if unknown:
+        parser.error(f"unknown renderers: {', '.join(unknown)} (choose from {', '.join(RENDERERS)})")
+
+    watch(args.renderers or list(RENDERERS), preview_dir=args.out, dpi=args.dpi, interval=args.interval)